@@ -2,6 +2,7 @@ from fastapi import Depends, HTTPException
 from fastapi.security import OAuth2PasswordBearer
 from src.util.jwt import decode_access_token
 from src.services import ldap_service
+from src.services import acl_service
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login")
 
@@ -29,3 +30,11 @@ def get_root_admin_user(current_user = Depends(get_current_user)):
     if "rootadmin" not in current_user.get("groups", []):
         raise HTTPException(status_code=403, detail="Root admin access required")
     return current_user
+
+def get_vm_owner_user(vm_id: int, current_user = Depends(get_current_user)):
+    """Require admin permissions or an ACL grant on the VM in the path"""
+    if current_user.get("is_admin"):
+        return current_user
+    if not acl_service.user_has_vm(current_user["username"], vm_id):
+        raise HTTPException(status_code=403, detail="You do not have access to this VM")
+    return current_user
@@ -1,9 +1,11 @@
+import asyncio
 from fastapi import APIRouter, Depends, HTTPException
 from pydantic import BaseModel, Field
 from src.services import ldap_service
 from src.api.auth_deps import get_admin_user
 from typing import Literal
 from src.services import proxmox_service
+from src.util import response_cache
 
 router = APIRouter(prefix="/admin", tags=["Admin"])
 
@@ -124,14 +126,14 @@ def admin_delete_user(username: str):
     }
 
 @router.get("/users/{username}/vms", dependencies=[Depends(get_admin_user)])
-def admin_get_user_vms(username: str):
+async def admin_get_user_vms(username: str):
     """Admin get list of VMs that a user has access to"""
-    user_info = ldap_service.get_user_info(username)
+    user_info = await asyncio.to_thread(ldap_service.get_user_info, username)
 
     if not user_info:
         raise HTTPException(status_code=404, detail=f"User {username} not found")
 
-    vms = proxmox_service.list_user_vms(username)
+    vms = await proxmox_service.list_user_vms(username)
 
     return {
         "success": True,
@@ -147,6 +149,7 @@ def grant_user_access(vmid: int, body: VMAccessRequest):
 
     result = proxmox_service.grant_vm_access(vmid, body.username)
     if result.get("success"):
+        response_cache.invalidate("proxmox/vms", "dashboard")  # the user's VM list changed
         return {"success": True, "message": f"Access granted to {body.username} for VM {vmid}"}
     else:
         raise HTTPException(status_code=500, detail=f"Failed to grant access: {result.get('error', 'Unknown error')}")
@@ -159,6 +162,7 @@ def revoke_user_access(vmid: int, username: str):
 
     result = proxmox_service.revoke_vm_access(vmid, username)
     if result.get("success"):
+        response_cache.invalidate("proxmox/vms", "dashboard")  # the user's VM list changed
         return {"success": True, "message": f"Access revoked from {username} for VM {vmid}"}
     else:
         raise HTTPException(status_code=500, detail=f"Failed to revoke access: {result.get('error', 'Unknown error')}")
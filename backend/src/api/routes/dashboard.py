@@ -0,0 +1,18 @@
+from fastapi import APIRouter, Depends, Request
+from src.api.auth_deps import get_current_user
+from src.services import dashboard_service
+from src.util import response_cache
+
+router = APIRouter(prefix="/dashboard", tags=["Dashboard"])
+
+DASHBOARD_CACHE_TTL = 5  # seconds
+
+
+@router.get("", summary="Get dashboard")
+async def get_dashboard(request: Request, current_user=Depends(get_current_user)):
+    """The user's VMs and containers with power state, IP address and console URL in one response"""
+    async def build():
+        return await dashboard_service.get_dashboard(current_user["username"], current_user["is_admin"])
+    return await response_cache.cached_response_async(
+        request, "dashboard", current_user["username"], DASHBOARD_CACHE_TTL, build
+    )
@@ -1,9 +1,12 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Request
 from src.services import guac_service
 from src.api.auth_deps import get_current_user
+from src.util import response_cache
 import src.models.models as models
 router = APIRouter(prefix="/guacamole", tags=["Guacamole"])
 
+CONNECTIONS_CACHE_TTL = 10  # seconds; the connection list is the same for every user
+
 
 # API
 @router.get("/token", dependencies=[Depends(get_current_user)], summary="Get Guacamole Token")
@@ -12,8 +15,10 @@ def get_guac_token():
     return guac_service.get_guac_token()
 
 @router.get("/connections", dependencies=[Depends(get_current_user)], summary="Get All Connections")
-def get_connections():
-    return guac_service.get_connections()
+def get_connections(request: Request):
+    return response_cache.cached_response(
+        request, "guacamole/connections", "*", CONNECTIONS_CACHE_TTL, guac_service.get_connections
+    )
 
 @router.get("/connections/{connection_id}", dependencies=[Depends(get_current_user)], summary="Get Connection Details")
 def get_connection(connection_id: str):
@@ -35,6 +40,7 @@ def create_ssh_connection(connection_data: models.CreateSSHConnectionRequest):
         max_connections_per_user=connection_data.max_connections_per_user
     )
 
+    response_cache.invalidate("guacamole/connections", "dashboard")
     return {
         "success": True,
         "message": f"SSH connection '{connection_data.name}' created successfully",
@@ -53,6 +59,7 @@ def create_vnc_connection(connection_data: models.CreateVNCConnectionRequest):
         max_connections_per_user=connection_data.max_connections_per_user
     )
 
+    response_cache.invalidate("guacamole/connections", "dashboard")
     return {
         "success": True,
         "message": f"VNC connection '{connection_data.name}' created successfully",
@@ -72,6 +79,7 @@ def create_rdp_connection(connection_data: models.CreateRDPConnectionRequest):
         max_connections_per_user=connection_data.max_connections_per_user
     )
 
+    response_cache.invalidate("guacamole/connections", "dashboard")
     return {
         "success": True,
         "message": f"VNC connection '{connection_data.name}' created successfully",
@@ -82,6 +90,7 @@ def create_rdp_connection(connection_data: models.CreateRDPConnectionRequest):
 def delete_guacamole_connection(connection_id: str):
     """Delete a Guacamole connection"""
     result = guac_service.delete_connection(connection_id)
+    response_cache.invalidate("guacamole/connections", "dashboard")
     return result
 
 @router.get("/connections/url/{name}", dependencies=[Depends(get_current_user)], summary="Get Connection URL by Name")
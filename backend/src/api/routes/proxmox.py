@@ -1,13 +1,26 @@
 import asyncio
-from fastapi import APIRouter, Depends, Response
-from src.api.auth_deps import get_current_user, get_admin_user
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from src.api.auth_deps import get_current_user, get_admin_user, get_vm_owner_user
 from src.services import proxmox_service
-from src.models.models import ProvisionRequest
+from src.util import response_cache
+from src.models.models import ProvisionRequest, ProvisionJobResponse, BulkPowerRequest
 from src.models.enums import SupportedOS
-import src.util.provision_worker as provision_worker
+from src.services import provision_queue_service, warm_pool_service, performance_stream, bulk_power_service
+from src.services import ip_service, acl_service
 
 router = APIRouter(prefix="/proxmox", tags=["Proxmox"])
 
+# Cached list responses (seconds); node metrics and container lists are the same for every user
+VMS_CACHE_TTL = 5
+CONTAINERS_CACHE_TTL = 5
+NODE_PERF_CACHE_TTL = 5
+SHARED = "*"
+
+
+def _invalidate_guest_lists():
+    response_cache.invalidate("proxmox/vms", "proxmox/containers", "dashboard")
+
 # Node endpoints
 @router.get("/nodes/{node}/report", dependencies=[Depends(get_current_user)], summary="Get Node Report")
 def get_node_system_report(node: str):
@@ -24,85 +37,150 @@ def node_performance_full(node: str):
     """Returns full performance metrics for a node"""
     return proxmox_service.get_node_performance_full(node)
 
+@router.get("/nodes/{node}/performance/stream", summary="Stream node performance metrics", dependencies=[Depends(get_current_user)])
+async def node_performance_stream(node: str, request: Request):
+    """Server-sent events: the node and VM performance summary, then deltas after every metrics sample"""
+    if not await performance_stream.has_node(node):
+        raise HTTPException(status_code=404, detail=f"Node {node} not found")
+    return StreamingResponse(
+        performance_stream.stream(node, request),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
 @router.get("/nodes/{node}/disk/health", summary="Get disk health for a node", dependencies=[Depends(get_current_user)])
-def get_disk_health(node: str):
+async def get_disk_health(node: str):
     """Get disk health status for a node"""
-    return proxmox_service.get_disk_health(node)
+    return await proxmox_service.get_disk_health(node)
 # load balance endpoint
-@router.get("/nodes/load-balance", summary="Load balance nodes", dependencies=[Depends(get_current_user)])
-def load_balance_nodes():
+@router.post("/nodes/load-balance", summary="Load balance nodes", dependencies=[Depends(get_admin_user)])
+async def load_balance_nodes():
     """Rebalance VMs across nodes based on current load"""
-    return proxmox_service.manual_load_balance()
+    return await proxmox_service.manual_load_balance()
+
+@router.get("/nodes/load-balance/plan", summary="Preview load balancing moves", dependencies=[Depends(get_admin_user)])
+async def load_balance_plan():
+    """Dry run: the migrations the next rebalance would make and the projected node load after them"""
+    return await proxmox_service.get_load_balance_plan()
 
 @router.get("/nodes/perf", summary="Get performance metrics for all nodes", dependencies=[Depends(get_current_user)])
-def get_all_nodes_performance():
+async def get_all_nodes_performance(request: Request):
     """Get performance metrics for all Proxmox nodes"""
-    return proxmox_service.get_all_node_metrics()
+    async def build():
+        metrics = await proxmox_service.get_all_node_metrics()
+        return {node: m.to_dict() for node, m in metrics.items()}
+    return await response_cache.cached_response_async(request, "proxmox/nodes/perf", SHARED, NODE_PERF_CACHE_TTL, build)
 
 # VM endpoints
 @router.get("/vms", summary="List VMs user has access to")
-def get_vms(current_user=Depends(get_current_user)):
-    if current_user["is_admin"]:
-        return proxmox_service.list_admin_vms()
-    else:
-        return proxmox_service.list_user_vms(current_user["username"])
+async def get_vms(request: Request, current_user=Depends(get_current_user)):
+    async def build():
+        if current_user["is_admin"]:
+            return await proxmox_service.list_admin_vms()
+        else:
+            return await proxmox_service.list_user_vms(current_user["username"])
+    return await response_cache.cached_response_async(
+        request, "proxmox/vms", current_user["username"], VMS_CACHE_TTL, build
+    )
 
 @router.get("/vms/ip", dependencies=[Depends(get_current_user)], summary="Get IP for VM")
-def get_virtual_machine_ip(node: str, vm_id: int):
-    """"Get the IP address of the virtual machine"""
-    return proxmox_service.get_vm_ip(node, vm_id)
-
-@router.post("/vms/{node}/{vm_id}/start", dependencies=[Depends(get_current_user)], summary="Start VM")
+async def get_virtual_machine_ip(vm_id: int, node: str | None = Query(default=None, deprecated=True)):
+    """"Get the IP address of the virtual machine; node is ignored, the guest is looked up by VMID"""
+    result = await ip_service.get_ip(vm_id)
+    return result["ip"]
+
+@router.get("/vms/ips", summary="Get IPs for many VMs and containers")
+async def get_guest_ips(vmids: list[int] = Query(default=[]), current_user=Depends(get_current_user)):
+    """Resolve the IP addresses of the given guests at once (all the user's guests if none are given)"""
+    if not current_user["is_admin"]:
+        allowed = await asyncio.to_thread(acl_service.get_user_vmids, current_user["username"])
+        vmids = [vmid for vmid in vmids if vmid in allowed] if vmids else sorted(allowed)
+    elif not vmids:
+        vmids = [vm["vmid"] for vm in await proxmox_service.list_admin_vms()]
+    return await ip_service.get_ips(vmids)
+
+@router.post("/vms/{node}/{vm_id}/start", dependencies=[Depends(get_vm_owner_user)], summary="Start VM")
 def start_virtual_machine(node: str, vm_id: int):
     """Start a virtual machine on the specified node"""
-    return proxmox_service.start_vm(node, vm_id)
+    result = proxmox_service.start_vm(node, vm_id)
+    _invalidate_guest_lists()
+    return result
 
-@router.post("/vms/{node}/{vm_id}/stop", dependencies=[Depends(get_current_user)], summary="Stop VM")
+@router.post("/vms/{node}/{vm_id}/stop", dependencies=[Depends(get_vm_owner_user)], summary="Stop VM")
 def stop_virtual_machine(node: str, vm_id: int):
     """Stop a virtual machine on the specified node"""
-    return proxmox_service.stop_vm(node, vm_id)
+    result = proxmox_service.stop_vm(node, vm_id)
+    _invalidate_guest_lists()
+    return result
 
-@router.post("/vms/{node}/{vm_id}/restart", dependencies=[Depends(get_current_user)], summary="Restart VM")
+@router.post("/vms/{node}/{vm_id}/restart", dependencies=[Depends(get_vm_owner_user)], summary="Restart VM")
 def restart_virtual_machine(node: str, vm_id: int):
     """Restart a virtual machine on the specified node"""
-    return proxmox_service.reboot_vm(node, vm_id)
+    result = proxmox_service.reboot_vm(node, vm_id)
+    _invalidate_guest_lists()
+    return result
+
+@router.post("/vms/bulk/power", dependencies=[Depends(get_admin_user)], summary="Bulk VM and container power action")
+async def bulk_power_action(req: BulkPowerRequest):
+    """Start, stop, reboot or shut down many VMs and containers at once; returns the UPID and result per guest"""
+    result = await bulk_power_service.bulk_power(req)
+    _invalidate_guest_lists()
+    return result
+
+@router.get("/vms/{vm_id}/migration-estimate", dependencies=[Depends(get_admin_user)], summary="Estimate VM migration cost")
+async def virtual_machine_migration_estimate(vm_id: int):
+    """Estimate how many bytes migrating the VM would copy and how long it would take"""
+    return await proxmox_service.get_migration_estimate(vm_id)
 
 @router.delete("/vms/{node}/{vm_id}/delete", dependencies=[Depends(get_admin_user)], summary="Delete VM")
 def delete_virtual_machine(node: str, vm_id: int):
     """Delete a virtual machine on the specified node"""
-    return proxmox_service.delete_vm(node, vm_id)
+    result = proxmox_service.delete_vm(node, vm_id)
+    _invalidate_guest_lists()
+    return result
 
 
 # Container endpoints
 @router.get("/containers", dependencies=[Depends(get_current_user)], summary="List all containers")
-def list_all_containers():
+async def list_all_containers(request: Request):
     """Get a list of all LXC containers across all nodes"""
-    return proxmox_service.list_lxc()
+    return await response_cache.cached_response_async(
+        request, "proxmox/containers", SHARED, CONTAINERS_CACHE_TTL, proxmox_service.list_lxc
+    )
 
 @router.get("/containers/ip", dependencies=[Depends(get_current_user)], summary="Get IP for Container")
-def get_lxc_ip(node: str, container_id: int):
-    """"Get the IP address of the LXC containers"""
-    return proxmox_service.get_lxc_ip(node, container_id)
+async def get_lxc_ip(container_id: int, node: str | None = Query(default=None, deprecated=True)):
+    """"Get the IP address of the LXC containers; node is ignored, the guest is looked up by VMID"""
+    result = await ip_service.get_ip(container_id)
+    return result["ip"]
 
 @router.post("/containers/{node}/{container_id}/start", dependencies=[Depends(get_current_user)], summary="Start Container")
 def start_lxc_container(node: str, container_id: int):
     """Start an LXC container on the specified node"""
-    return proxmox_service.start_lxc(node, container_id)
+    result = proxmox_service.start_lxc(node, container_id)
+    _invalidate_guest_lists()
+    return result
 
 @router.post("/containers/{node}/{container_id}/stop", dependencies=[Depends(get_current_user)], summary="Stop Container")
 def stop_lxc_container(node: str, container_id: int):
     """Stop an LXC container on the specified node"""
-    return proxmox_service.stop_lxc(node, container_id)
+    result = proxmox_service.stop_lxc(node, container_id)
+    _invalidate_guest_lists()
+    return result
 
 @router.post("/containers/{node}/{container_id}/restart", dependencies=[Depends(get_current_user)], summary="Restart Container")
 def restart_lxc_container(node: str, container_id: int):
     """Restart an LXC container on the specified node"""
-    return proxmox_service.reboot_lxc(node, container_id)
+    result = proxmox_service.reboot_lxc(node, container_id)
+    _invalidate_guest_lists()
+    return result
 
 @router.delete("/containers/{node}/{container_id}/delete", dependencies=[Depends(get_admin_user)], summary="Delete Container")
 def delete_lxc_container(node: str, container_id: int):
     """Delete an LXC container on the specified node"""
-    return proxmox_service.delete_lxc(node, container_id)
+    result = proxmox_service.delete_lxc(node, container_id)
+    _invalidate_guest_lists()
+    return result
 
 
 # Proxmox Authentication Management
@@ -143,9 +221,23 @@ def get_os_templates():
         ]
     }
 
-@router.post("/provision", dependencies=[Depends(get_current_user)], summary="Provision VM from OS Template")
-def provision_vm(req: ProvisionRequest):
-    return asyncio.run(provision_worker.provision_worker(req))
+@router.post("/provision", status_code=202, response_model=ProvisionJobResponse, summary="Provision VM from OS Template")
+async def provision_vm(req: ProvisionRequest, current_user=Depends(get_current_user)):
+    """Queue a provisioning job; poll /proxmox/provision/jobs/{job_id} for progress"""
+    return await provision_queue_service.submit(req, requested_by=current_user["username"])
+
+@router.get("/provision/jobs/{job_id}", response_model=ProvisionJobResponse, summary="Get provisioning job status")
+async def get_provision_job(job_id: str, current_user=Depends(get_current_user)):
+    """Get status, current stage and result of a provisioning job"""
+    job = await asyncio.to_thread(provision_queue_service.get_job, job_id)
+    if not job or (not current_user["is_admin"] and job["requested_by"] != current_user["username"]):
+        raise HTTPException(status_code=404, detail=f"Provisioning job {job_id} not found")
+    return job
+
+@router.get("/warm-pool", dependencies=[Depends(get_admin_user)], summary="Get warm pool status")
+async def get_warm_pool_status():
+    """Get the number of ready and preparing pre-cloned VMs per OS"""
+    return await asyncio.to_thread(warm_pool_service.get_pool_status)
 
 @router.get("/nodes/vms/console/{vm_name}", dependencies=[Depends(get_current_user)], summary="Get VM Console URL")
 def get_vm_console_url(vm_name: str):
@@ -156,10 +248,4 @@ def get_vm_console_url(vm_name: str):
             status_code=404,
             content={"message": "No console available for this VM"}
         )
-    PVEauthCookie = proxmox_service.get_access_cookie()
-    if not PVEauthCookie:
-        return Response.JSONResponse(
-            status_code=500,
-            content={"message": "Failed to retrieve Proxmox authentication cookie"}
-        )
-    return {"url": novnc_url, "pve_cookie": PVEauthCookie}
\ No newline at end of file
+    return {"url": novnc_url}
\ No newline at end of file
@@ -1,7 +1,19 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from src.api.routes import auth, server, proxmox, users, guacamole, admin
+from src.api.routes import auth, server, proxmox, users, guacamole, admin, dashboard
 import src.services.load_balance_service as load_balance_service
+import src.services.acl_service as acl_service
+import src.services.provision_queue_service as provision_queue_service
+import src.services.warm_pool_service as warm_pool_service
+import src.services.metrics_sampler as metrics_sampler
+import src.services.load_forecast_service as load_forecast_service
+import src.services.rebalance_trigger as rebalance_trigger
+import src.services.performance_stream as performance_stream
+import src.services.ip_service as ip_service
+from src.util.database import init_db
+from src.util.leader import run_as_leader
+from src.util.proxmox_client import proxmox_async
+from src.util.proxmox_ticket import close_all_sessions
 import asyncio
 
 app = FastAPI(
@@ -23,17 +35,41 @@ app.include_router(users.router)
 app.include_router(admin.router)
 app.include_router(proxmox.router)
 app.include_router(guacamole.router)
+app.include_router(dashboard.router)
 app.include_router(server.router)
 
 
 async def start_load_balance_service():
     while True:
-        await asyncio.to_thread(load_balance_service.rebalance)
-        print("Rebalance cycle complete. Waiting for next cycle...")
-        await asyncio.sleep(900)  # every 15 minutes
+        try:
+            await load_balance_service.rebalance()
+            print("Rebalance cycle complete. Waiting for an overload trigger...")
+        except HTTPException as e:
+            print(f"Skipping this rebalance cycle: {e.detail}")  # a manual rebalance is running
+        nodes = await rebalance_trigger.wait_for_trigger()  # falls back to every 15 minutes
+        print(f"Rebalance triggered by {', '.join(nodes)}" if nodes else "Running scheduled fallback rebalance")
 
 @app.on_event("startup")
 async def startup_event():
+    rebalance_trigger.start()
+    performance_stream.start()
+    asyncio.create_task(metrics_sampler.start_sampler())
+    asyncio.create_task(acl_service.start_refresh_loop())
+    try:
+        await asyncio.to_thread(init_db)
+    except Exception as e:
+        print(f"Database initialisation failed: {e}")
+    provision_queue_service.start_workers()
+    print("Provisioning workers started.")
+    asyncio.create_task(load_forecast_service.start_profile_loop())
+    # Cluster-wide loops run in a single process; the others stand by to take over
     print("Starting load balance service...")
-    asyncio.create_task(start_load_balance_service())
-    print("Load balance service started.")
+    asyncio.create_task(run_as_leader("load-balancer", start_load_balance_service))
+    asyncio.create_task(run_as_leader("warm-pool-refill", warm_pool_service.start_refill_loop))
+    asyncio.create_task(run_as_leader("load-profile-writer", load_forecast_service.start_profile_writer))
+    asyncio.create_task(run_as_leader("ip-refresh", ip_service.start_refresh_loop))
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    await proxmox_async.aclose()
+    close_all_sessions()
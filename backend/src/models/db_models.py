@@ -0,0 +1,63 @@
+from datetime import datetime, timezone
+from sqlalchemy import Column, Integer, String, Text, DateTime, JSON, Float
+from src.util.database import Base
+
+
+def utcnow():
+    return datetime.now(timezone.utc)
+
+
+class ProvisionJob(Base):
+    __tablename__ = "provision_jobs"
+
+    id = Column(String(36), primary_key=True)
+    status = Column(String(16), nullable=False, default="queued", index=True)  # queued, running, succeeded, failed
+    stage = Column(String(32), nullable=False, default="queued")
+    node = Column(String(64), nullable=True, index=True)
+    request = Column(JSON, nullable=True)  # cleared once the job finishes, it holds the VM password
+    result = Column(JSON, nullable=True)
+    error = Column(Text, nullable=True)
+    requested_by = Column(String(128), nullable=True)
+    created_at = Column(DateTime(timezone=True), nullable=False, default=utcnow)
+    updated_at = Column(DateTime(timezone=True), nullable=False, default=utcnow, onupdate=utcnow)
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+
+
+class WarmPoolVM(Base):
+    __tablename__ = "warm_pool_vms"
+
+    vmid = Column(Integer, primary_key=True, autoincrement=False)
+    os = Column(String(32), nullable=False, index=True)
+    node = Column(String(64), nullable=True)
+    state = Column(String(16), nullable=False, default="preparing")  # preparing, ready
+    created_at = Column(DateTime(timezone=True), nullable=False, default=utcnow)
+    updated_at = Column(DateTime(timezone=True), nullable=False, default=utcnow, onupdate=utcnow)
+
+
+class VMIDReservation(Base):
+    __tablename__ = "vmid_reservations"
+
+    vmid = Column(Integer, primary_key=True, autoincrement=False)
+    owner = Column(String(128), nullable=True)
+    reserved_at = Column(DateTime(timezone=True), nullable=False, default=utcnow)
+    expires_at = Column(DateTime(timezone=True), nullable=False, index=True)
+
+
+class NodeLoadProfile(Base):
+    __tablename__ = "node_load_profiles"
+
+    node = Column(String(64), primary_key=True)
+    hour_of_week = Column(Integer, primary_key=True, autoincrement=False)  # 0 = Monday 00:00 local time
+    cpu = Column(Float, nullable=False)  # percent, averaged across weeks
+    memory = Column(Float, nullable=False)
+    io_delay = Column(Float, nullable=False)
+    samples = Column(Integer, nullable=False, default=0)  # weeks folded into the averages
+    updated_at = Column(DateTime(timezone=True), nullable=False, default=utcnow, onupdate=utcnow)
+
+
+class AclGeneration(Base):
+    __tablename__ = "acl_generation"
+
+    id = Column(Integer, primary_key=True, autoincrement=False)  # single row, id 1
+    generation = Column(Integer, nullable=False, default=0)  # bumped on every grant change made through the API
+    updated_at = Column(DateTime(timezone=True), nullable=False, default=utcnow, onupdate=utcnow)
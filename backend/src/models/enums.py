@@ -5,6 +5,12 @@ class SupportedOS(str, Enum):
     debian = "Debian"
     centos = "CentOS"
 
+class PowerAction(str, Enum):
+    start = "start"
+    stop = "stop"
+    reboot = "reboot"
+    shutdown = "shutdown"
+
 OS_TEMPLATE_MAP = {
     SupportedOS.ubuntu: 203,
     SupportedOS.debian: 204,
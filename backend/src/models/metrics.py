@@ -0,0 +1,42 @@
+from dataclasses import dataclass, replace
+
+
+@dataclass(slots=True)
+class NodeMetrics:
+    """Load of one node; usage values in percent, memory sizes in bytes"""
+    node: str
+    cpu: float
+    memory: float
+    io_delay: float
+    disk: float = 0.0  # root filesystem usage
+    mem_committed: int = 0  # sum of maxmem of the guests on the node, running or not
+    mem_total: int = 0
+
+    @property
+    def committed(self) -> float:
+        """Committed guest memory as a percentage of the node's memory"""
+        return self.mem_committed / self.mem_total * 100 if self.mem_total else 0.0
+
+    def with_load(
+        self,
+        cpu: float | None = None,
+        memory: float | None = None,
+        mem_committed: int | None = None,
+    ) -> "NodeMetrics":
+        """Copy with CPU, memory and/or committed memory replaced, e.g. to project the effect of a migration"""
+        return replace(
+            self,
+            cpu=self.cpu if cpu is None else max(cpu, 0.0),
+            memory=self.memory if memory is None else max(memory, 0.0),
+            mem_committed=self.mem_committed if mem_committed is None else max(mem_committed, 0),
+        )
+
+    def to_dict(self) -> dict:
+        """API representation, keyed the way /proxmox/nodes/perf has always returned it"""
+        return {
+            "CPU": self.cpu,
+            "Memory": self.memory,
+            "IO_Delay": self.io_delay,
+            "Disk": self.disk,
+            "Committed_Memory": self.committed,
+        }
@@ -1,20 +1,39 @@
+from datetime import datetime
 from pydantic import BaseModel, Field
-from src.models.enums import SupportedOS
+from src.models.enums import SupportedOS, PowerAction
 
 class ProvisionRequest(BaseModel):
     username: str
     password: str
     ssh_key: str
     os: SupportedOS
+    linked_clone: bool = Field(default=False, description="Linked clone (full=0) for short-lived lab VMs")
 
 class ProvisionResponse(BaseModel):
     vmid: int
     ip: str | None
     node: str
 
+class ProvisionJobResponse(BaseModel):
+    job_id: str
+    status: str
+    stage: str
+    node: str | None = None
+    result: ProvisionResponse | None = None
+    error: str | None = None
+    created_at: datetime
+    updated_at: datetime
+    finished_at: datetime | None = None
+
 class GroupRequest(BaseModel):
     group: str
 
+class BulkPowerRequest(BaseModel):
+    action: PowerAction
+    vmids: list[int] = Field(default_factory=list, examples=[[101, 102]])
+    group: str | None = Field(default=None, examples=["user"], description="LDAP group whose members' VMs are included")
+    wait: bool = Field(default=True, description="Wait for the tasks to finish and report their exit status")
+
 class CreateSSHConnectionRequest(BaseModel):
     name: str = Field(examples=["App-server"])
     hostname: str = Field(examples=["10.51.32.242"], description="IP address of the server")
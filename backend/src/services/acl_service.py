@@ -0,0 +1,157 @@
+import asyncio
+import threading
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert
+from src.util.database import SessionLocal
+from src.util.proxmox_util import proxmox
+from src.models.db_models import AclGeneration, utcnow
+
+ACL_REFRESH_INTERVAL = 300  # seconds between full /access/acl rebuilds, for changes made outside this API
+
+# Every process keeps its own index. Grant changes made through the API bump a generation counter
+# in the database, and a process that sees a newer generation rebuilds before answering.
+_lock = threading.Lock()
+_rebuild_lock = threading.Lock()  # one /access/acl fetch at a time
+_vmids_by_user: dict[str, set[int]] = {}  # lowercase username (without realm) -> VMIDs
+_loaded = False
+_seen_generation: int | None = None  # database generation the index was built at
+_pending: list[tuple] | None = None  # local changes made while a rebuild is fetching, replayed onto its result
+
+
+def _user_key(username: str) -> str:
+    return username.split("@")[0].lower()
+
+
+def _read_generation() -> int | None:
+    try:
+        with SessionLocal() as db:
+            return db.scalar(select(AclGeneration.generation).where(AclGeneration.id == 1)) or 0
+    except Exception as e:
+        print(f"Reading the ACL generation failed: {e}")
+        return None
+
+
+def _bump_generation():
+    """Tell the other processes their index is out of date"""
+    try:
+        with SessionLocal() as db:
+            stmt = insert(AclGeneration).values(id=1, generation=1, updated_at=utcnow())
+            db.execute(stmt.on_conflict_do_update(
+                index_elements=["id"],
+                set_={"generation": AclGeneration.generation + 1, "updated_at": utcnow()},
+            ))
+            db.commit()
+    except Exception as e:
+        print(f"Publishing the ACL change failed, other processes pick it up on their next rebuild: {e}")
+
+
+def _apply(index: dict[str, set[int]], change: tuple):
+    op, username, vmid = change
+    if op == "add":
+        index.setdefault(username, set()).add(vmid)
+    elif op == "remove":
+        index.get(username, set()).discard(vmid)
+    else:
+        for vmids in index.values():
+            vmids.discard(vmid)
+
+
+def _change(change: tuple):
+    with _lock:
+        _apply(_vmids_by_user, change)
+        if _pending is not None:
+            _pending.append(change)
+    _bump_generation()
+
+
+def _rebuild(generation: int | None):
+    global _vmids_by_user, _loaded, _seen_generation, _pending
+    with _lock:
+        _pending = []
+    try:
+        index: dict[str, set[int]] = {}
+        for entry in proxmox.access.acl.get():
+            if entry["type"] != "user":
+                continue
+            if not entry["path"].startswith("/vms/"):
+                continue
+            try:
+                vmid = int(entry["path"].split("/vms/")[1])
+            except ValueError:
+                continue
+            index.setdefault(_user_key(entry["ugid"]), set()).add(vmid)
+
+        with _lock:
+            # The fetch may or may not include these; replaying them is idempotent
+            for change in _pending:
+                _apply(index, change)
+            _vmids_by_user = index
+            _loaded = True
+            _seen_generation = generation
+    finally:
+        with _lock:
+            _pending = None
+
+
+def rebuild():
+    """Rebuild the user -> VMID index from the full Proxmox ACL"""
+    with _rebuild_lock:
+        _rebuild(_read_generation())
+
+
+def _ensure_fresh():
+    """Rebuild if the index was never loaded or another process changed a grant since"""
+    generation = _read_generation()
+    with _lock:
+        fresh = _loaded and (generation is None or generation == _seen_generation)
+    if fresh:
+        return
+    with _rebuild_lock:
+        with _lock:
+            fresh = _loaded and (generation is None or generation == _seen_generation)
+        if not fresh:
+            _rebuild(generation)
+
+
+def get_user_vmids(username: str) -> set[int]:
+    """Return the VMIDs a user has been granted access to"""
+    _ensure_fresh()
+    with _lock:
+        return set(_vmids_by_user.get(_user_key(username), ()))
+
+
+def _has_vm(username: str, vmid: int) -> bool:
+    with _lock:
+        return int(vmid) in _vmids_by_user.get(_user_key(username), ())
+
+
+def user_has_vm(username: str, vmid: int) -> bool:
+    """Check whether a user has been granted access to a VM; a miss is confirmed against the live ACL"""
+    _ensure_fresh()
+    if _has_vm(username, vmid):
+        return True
+    rebuild()  # the grant may have been made outside this API since the last rebuild
+    return _has_vm(username, vmid)
+
+
+def add_grant(username: str, vmid: int):
+    _change(("add", _user_key(username), int(vmid)))
+
+
+def remove_grant(username: str, vmid: int):
+    _change(("remove", _user_key(username), int(vmid)))
+
+
+def forget_vm(vmid: int):
+    """Drop a deleted VM from every user's grants"""
+    _change(("forget", None, int(vmid)))
+
+
+async def start_refresh_loop():
+    """Periodically rebuild the index to pick up ACL changes made outside this API"""
+    while True:
+        try:
+            await asyncio.to_thread(rebuild)
+        except Exception as e:
+            print(f"ACL index refresh failed: {e}")
+        await asyncio.sleep(ACL_REFRESH_INTERVAL)
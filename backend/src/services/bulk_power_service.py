@@ -0,0 +1,99 @@
+import asyncio
+from fastapi import HTTPException
+from src.util.env import get_int_env
+from src.util.proxmox_client import proxmox_async
+from src.models.enums import PowerAction
+from src.models.models import BulkPowerRequest
+import src.util.proxmox_util as proxmox_util
+import src.services.inventory_service as inventory_service
+import src.services.acl_service as acl_service
+import src.services.ldap_service as ldap_service
+import src.services.ip_service as ip_service
+
+BULK_POWER_MAX_PER_NODE = get_int_env("BULK_POWER_MAX_PER_NODE", 5)  # power tasks running at once per node
+BULK_POWER_TASK_TIMEOUT = 300  # seconds to wait for each task
+
+# Guest status once the action has completed
+_STATUS_AFTER = {
+    PowerAction.start: "running",
+    PowerAction.reboot: "running",
+    PowerAction.stop: "stopped",
+    PowerAction.shutdown: "stopped",
+}
+
+_node_slots: dict[str, asyncio.Semaphore] = {}
+
+
+def _slots(node: str) -> asyncio.Semaphore:
+    if node not in _node_slots:
+        _node_slots[node] = asyncio.Semaphore(BULK_POWER_MAX_PER_NODE)
+    return _node_slots[node]
+
+
+def _group_vmids(group: str) -> set[int]:
+    members = ldap_service.list_group_members(group)
+    if members is None:
+        raise HTTPException(status_code=404, detail=f"Group {group} not found")
+    vmids = set()
+    for username in members:
+        vmids |= acl_service.get_user_vmids(username)
+    return vmids
+
+
+def _already_done(guest: dict, action: PowerAction) -> bool:
+    """Starting a running guest or stopping/rebooting a stopped one would only fail upstream"""
+    if action == PowerAction.start:
+        return guest.get("status") == "running"
+    return guest.get("status") == "stopped"
+
+
+async def _run(guest: dict, action: PowerAction, wait: bool) -> dict:
+    vmid, node, kind = guest["vmid"], guest["node"], guest["type"]
+    outcome = {"vmid": vmid, "name": guest.get("name", ""), "node": node, "type": kind, "upid": None}
+    if _already_done(guest, action):
+        outcome["status"] = "skipped"
+        outcome["detail"] = f"already {guest.get('status')}"
+        return outcome
+
+    async with _slots(node):
+        try:
+            outcome["upid"] = await proxmox_async.post(f"/nodes/{node}/{kind}/{vmid}/status/{action.value}")
+            if wait:
+                outcome["exitstatus"] = await proxmox_util.wait_for_task_completion(
+                    outcome["upid"], timeout=BULK_POWER_TASK_TIMEOUT
+                )
+            inventory_service.patch_guest(vmid, status=_STATUS_AFTER[action])
+            ip_service.invalidate(vmid)
+            outcome["status"] = "succeeded" if wait else "submitted"
+        except Exception as e:
+            outcome["status"] = "failed"
+            outcome["error"] = str(e)
+    return outcome
+
+
+async def bulk_power(req: BulkPowerRequest) -> dict:
+    """
+    Run one power action on many VMs and containers, given as VMIDs and/or an LDAP group whose
+    members' VMs are included. Tasks run concurrently, at most BULK_POWER_MAX_PER_NODE per node.
+    """
+    vmids = set(req.vmids)
+    if req.group:
+        vmids |= await asyncio.to_thread(_group_vmids, req.group)
+    if not vmids:
+        raise HTTPException(status_code=400, detail="No VMs given")
+
+    guests = {
+        guest["vmid"]: guest
+        for guest in await inventory_service.get_vms_async() + await inventory_service.get_lxcs_async()
+        if not guest.get("template")
+    }
+    results = list(await asyncio.gather(
+        *(_run(guests[vmid], req.action, req.wait) for vmid in sorted(vmids) if vmid in guests)
+    ))
+    results += [{"vmid": vmid, "upid": None, "status": "not_found"} for vmid in sorted(vmids - guests.keys())]
+
+    summary: dict[str, int] = {}
+    for outcome in results:
+        summary[outcome["status"]] = summary.get(outcome["status"], 0) + 1
+    print(f"Bulk {req.action.value} of {len(vmids)} guests: {summary}")
+    return {"action": req.action.value, "summary": summary, "results": results}
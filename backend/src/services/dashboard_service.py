@@ -0,0 +1,48 @@
+import asyncio
+import src.services.proxmox_service as proxmox_service
+import src.services.guac_service as guac_service
+import src.services.ip_service as ip_service
+
+
+def _console_urls(names: list[str]) -> dict[str, str]:
+    """Guacamole embed URLs by connection name, from the cached connection index"""
+    index = guac_service.get_connection_index()
+    return {
+        name: guac_service.get_connection_url(guac_service.encode_guac_identifier(index[name]))
+        for name in names
+        if name in index
+    }
+
+
+async def get_dashboard(username: str, is_admin: bool) -> dict:
+    """
+    Everything the dashboard renders in one response: the user's VMs and containers with their
+    power state, IP address and Guacamole console URL. IPs and Guacamole lookups run concurrently
+    and come from the shared caches.
+    """
+    vms, containers = await asyncio.gather(
+        proxmox_service.list_admin_vms() if is_admin else proxmox_service.list_user_vms(username),
+        proxmox_service.list_lxc(),
+    )
+    resources = [{**vm, "type": "vm"} for vm in vms] + [
+        {"node": lxc["node"], "vmid": lxc["lxcid"], "name": lxc["name"], "status": lxc["status"], "type": "lxc"}
+        for lxc in containers
+    ]
+
+    ips, console_urls = await asyncio.gather(
+        ip_service.get_ips([resource["vmid"] for resource in resources]),
+        asyncio.to_thread(_console_urls, [resource["name"] for resource in resources]),
+        return_exceptions=True,
+    )
+    # A Guacamole or guest agent outage should not take the whole dashboard down
+    if isinstance(ips, Exception):
+        print(f"Resolving dashboard IPs failed: {ips}")
+        ips = {}
+    if isinstance(console_urls, Exception):
+        print(f"Looking up Guacamole connections failed: {console_urls}")
+        console_urls = {}
+
+    for resource in resources:
+        resource["ip"] = ips.get(resource["vmid"], {}).get("ip")
+        resource["console_url"] = console_urls.get(resource["name"])
+    return {"username": username, "resources": resources}
@@ -1,10 +1,18 @@
 import httpx
+import threading
+import time
 from src.util.env import get_required_env
 import base64
 GUAC_URL = get_required_env("GUACAMOLE_URL")
 GUAC_USER = get_required_env("GUACAMOLE_USERNAME")
 GUAC_PASS = get_required_env("GUACAMOLE_PASSWORD")
 GUAC_EMBED = get_required_env("GUACAMOLE_URL_EMBED")
+GUAC_TOKEN_TTL = 300  # seconds an auth token is reused for embed URLs; Guacamole expires idle sessions after 60 minutes
+GUAC_INDEX_TTL = 30  # seconds the connection name index is reused
+
+_lock = threading.Lock()
+_token: tuple[float, str] | None = None  # (expires, authToken)
+_index: tuple[float, dict[str, str]] | None = None  # (expires, connection name -> identifier)
 
 
 def get_guac_token():
@@ -17,6 +25,17 @@ def get_guac_token():
     res.raise_for_status()
     return res.json()
 
+def get_cached_auth_token() -> str:
+    """Auth token shared by embed URLs instead of logging in once per URL"""
+    global _token
+    with _lock:
+        if _token and _token[0] > time.monotonic():
+            return _token[1]
+    token = get_guac_token()["authToken"]
+    with _lock:
+        _token = (time.monotonic() + GUAC_TOKEN_TTL, token)
+    return token
+
 def get_formatted_token():
     """Get formatted authorization token as headers dictionary"""
     token_data = get_guac_token()
@@ -44,8 +63,7 @@ def get_connection(connection_id: str):
 
 def get_connection_url(connection_id: str) -> str:
     """Get direct connection URL for embedding"""
-    token_data = get_guac_token()
-    auth_token = token_data["authToken"]
+    auth_token = get_cached_auth_token()
 
     connection_url = f"{GUAC_EMBED}/#/client/{connection_id}?token={auth_token}"
     return connection_url
@@ -91,6 +109,7 @@ def create_ssh_connection(
                 "message": response_data["message"]
             }
     res.raise_for_status()
+    invalidate_connection_index()
     return res.json()
 
 def create_vnc_connection(
@@ -134,6 +153,7 @@ def create_vnc_connection(
                 "message": response_data["message"]
             }
     res.raise_for_status()
+    invalidate_connection_index()
     return res.json()
 
 def create_rdp_connection(
@@ -179,6 +199,7 @@ def create_rdp_connection(
                 "message": response_data["message"]
             }
     res.raise_for_status()
+    invalidate_connection_index()
     return res.json()
 
 def delete_connection(connection_id: str):
@@ -196,19 +217,37 @@ def delete_connection(connection_id: str):
             "message": f"Connection with ID {connection_id} does not exist"
         }
     res.raise_for_status()
+    invalidate_connection_index()
     return {"success": True, "message": f"Connection {connection_id} deleted successfully"}
 
+def get_connection_index() -> dict[str, str]:
+    """Map connection names to identifiers, cached for GUAC_INDEX_TTL"""
+    global _index
+    with _lock:
+        if _index and _index[0] > time.monotonic():
+            return _index[1]
+    index = {}
+    for conn in get_connections():
+        index.setdefault(conn["name"], conn["identifier"])  # the first connection with a name wins
+    with _lock:
+        _index = (time.monotonic() + GUAC_INDEX_TTL, index)
+    return index
+
+def invalidate_connection_index():
+    global _index
+    with _lock:
+        _index = None
+
 def get_connection_url_by_name(name: str):
     """Get direct connection URL for embedding, based on connection name"""
-    connections = get_connections()
-    for conn in connections:
-        if conn["name"] == name:
-            coded_id = encode_guac_identifier(conn["identifier"])
-            return get_connection_url(coded_id)
+    identifier = get_connection_index().get(name)
+    if identifier is not None:
+        return get_connection_url(encode_guac_identifier(identifier))
     return {
         "error": "Connection not found",
         "message": f"No connection found with name '{name}'"
     }
+
 def encode_guac_identifier(id_str, type_str="c", datasource="postgresql"):
     raw = f"{id_str}\0{type_str}\0{datasource}"
     encoded = base64.b64encode(raw.encode("utf-8"))
@@ -0,0 +1,272 @@
+import asyncio
+import threading
+import time
+from src.util.proxmox_util import proxmox
+from src.util.proxmox_client import proxmox_async
+
+INVENTORY_TTL = 10  # seconds between /cluster/resources refreshes
+
+_lock = threading.Lock()
+_refresh_lock = threading.Lock()
+_resources: dict[str, dict] = {}  # keyed by resource id, e.g. "qemu/101", "node/node0"
+_fetched_at = 0.0
+
+# Hash indexes over the guest (qemu + lxc) entries, kept in step with _resources
+_node_by_vmid: dict[int, str] = {}
+_vmids_by_name: dict[str, set[int]] = {}  # more than one VMID means a name collision
+_by_name: dict[str, tuple[int, str]] = {}  # name -> (lowest vmid, node)
+
+_node_status: dict[str, tuple[float, dict]] = {}
+_refresh_task: asyncio.Task | None = None
+
+
+def _is_guest(res: dict | None) -> bool:
+    return bool(res) and res.get("type") in ("qemu", "lxc")
+
+
+def _reindex_name(name: str):
+    vmids = _vmids_by_name.get(name)
+    if not vmids:
+        _vmids_by_name.pop(name, None)
+        _by_name.pop(name, None)
+        return
+    vmid = min(vmids)
+    _by_name[name] = (vmid, _node_by_vmid[vmid])
+
+
+def _index_remove(res: dict):
+    vmid = int(res["vmid"])
+    _node_by_vmid.pop(vmid, None)
+    name = res.get("name")
+    if name is not None:
+        _vmids_by_name.get(name, set()).discard(vmid)
+        _reindex_name(name)
+
+
+def _index_add(res: dict):
+    vmid = int(res["vmid"])
+    _node_by_vmid[vmid] = res["node"]
+    name = res.get("name")
+    if name is not None:
+        _vmids_by_name.setdefault(name, set()).add(vmid)
+        _reindex_name(name)
+
+
+def _index_update(old: dict | None, new: dict | None):
+    """Update the indexes for one guest whose entry changed between snapshots"""
+    if old and new and old.get("name") == new.get("name") and old.get("node") == new.get("node"):
+        return
+    if _is_guest(old):
+        _index_remove(old)
+    if _is_guest(new):
+        _index_add(new)
+
+
+def _apply_snapshot(snapshot: list[dict]):
+    global _resources, _fetched_at
+    resources = {res["id"]: res for res in snapshot if "id" in res}
+    with _lock:
+        # Only guests that appeared, vanished, moved or were renamed touch the indexes
+        for res_id in _resources.keys() | resources.keys():
+            _index_update(_resources.get(res_id), resources.get(res_id))
+        _resources = resources
+        _fetched_at = time.monotonic()
+
+
+def refresh():
+    """Replace the inventory with a fresh /cluster/resources snapshot"""
+    _apply_snapshot(proxmox.cluster.resources.get())
+
+
+async def refresh_async():
+    """Same as refresh(), but through the shared async client"""
+    _apply_snapshot(await proxmox_async.get("/cluster/resources"))
+
+
+def _refresh_in_background():
+    if not _refresh_lock.acquire(blocking=False):
+        return  # a refresh is already running
+    try:
+        refresh()
+    except Exception as e:
+        print(f"Inventory refresh failed: {e}")
+    finally:
+        _refresh_lock.release()
+
+
+def _is_stale() -> bool:
+    return not _fetched_at or time.monotonic() - _fetched_at > INVENTORY_TTL
+
+
+def _ensure_fresh():
+    if not _is_stale():
+        return
+    with _refresh_lock:
+        # Another thread may have refreshed while we waited for the lock
+        if _is_stale():
+            refresh()
+
+
+async def ensure_fresh_async():
+    """Refresh a stale snapshot; concurrent callers share one in-flight request"""
+    global _refresh_task
+    if not _is_stale():
+        return
+    if _refresh_task is None or _refresh_task.done() or _refresh_task.get_loop() is not asyncio.get_running_loop():
+        _refresh_task = asyncio.ensure_future(refresh_async())
+    await asyncio.shield(_refresh_task)
+
+
+def _ensure_loaded():
+    """
+    Make sure a snapshot exists without blocking on a stale one.
+    Lookups serve the current indexes and revalidate in the background.
+    """
+    if not _fetched_at:
+        _ensure_fresh()
+    elif _is_stale():
+        threading.Thread(target=_refresh_in_background, daemon=True).start()
+
+
+def invalidate():
+    """Force the next read to fetch a new snapshot"""
+    global _fetched_at
+    with _lock:
+        _fetched_at = 0.0
+
+
+def _select(kind: str) -> list[dict]:
+    with _lock:
+        return [dict(res) for res in _resources.values() if res.get("type") == kind]
+
+
+def get_resources(kind: str) -> list[dict]:
+    """Return a copy of every cached resource of the given type (qemu, lxc, node, storage)"""
+    _ensure_fresh()
+    return _select(kind)
+
+
+async def get_resources_async(kind: str) -> list[dict]:
+    await ensure_fresh_async()
+    return _select(kind)
+
+
+def get_vms() -> list[dict]:
+    return get_resources("qemu")
+
+
+def get_lxcs() -> list[dict]:
+    return get_resources("lxc")
+
+
+def get_nodes() -> list[dict]:
+    return get_resources("node")
+
+
+async def get_vms_async() -> list[dict]:
+    return await get_resources_async("qemu")
+
+
+async def get_lxcs_async() -> list[dict]:
+    return await get_resources_async("lxc")
+
+
+async def get_nodes_async() -> list[dict]:
+    return await get_resources_async("node")
+
+
+def get_guest(vmid: int) -> dict | None:
+    """Return the cached qemu or lxc entry for a VMID"""
+    _ensure_fresh()
+    with _lock:
+        for kind in ("qemu", "lxc"):
+            res = _resources.get(f"{kind}/{vmid}")
+            if res:
+                return dict(res)
+    return None
+
+
+def patch_guest(vmid: int, **fields):
+    """Update cached fields of a guest after a mutation we issued ourselves"""
+    with _lock:
+        for kind in ("qemu", "lxc"):
+            res = _resources.get(f"{kind}/{vmid}")
+            if res:
+                old = dict(res)
+                res.update(fields)
+                _index_update(old, res)
+
+
+def remove_guest(vmid: int):
+    """Drop a guest from the cache after it has been deleted"""
+    with _lock:
+        for kind in ("qemu", "lxc"):
+            res = _resources.pop(f"{kind}/{vmid}", None)
+            if res:
+                _index_remove(res)
+
+
+def find_by_name(name: str) -> tuple[int, str] | None:
+    """Return (vmid, node) for a guest name; the lowest VMID wins on a collision"""
+    _ensure_loaded()
+    found = _by_name.get(name)
+    if found is None and _is_stale():
+        _ensure_fresh()
+        found = _by_name.get(name)
+    return found
+
+
+def find_node(vmid: int) -> str | None:
+    """Return the node a guest lives on"""
+    _ensure_loaded()
+    node = _node_by_vmid.get(int(vmid))
+    if node is None and _is_stale():
+        _ensure_fresh()
+        node = _node_by_vmid.get(int(vmid))
+    return node
+
+
+def get_name_collisions() -> dict[str, list[int]]:
+    """Return every guest name shared by more than one VMID"""
+    _ensure_loaded()
+    with _lock:
+        return {name: sorted(vmids) for name, vmids in _vmids_by_name.items() if len(vmids) > 1}
+
+
+def get_committed_memory() -> dict[str, int]:
+    """Sum of guest maxmem per node, stopped guests included and templates excluded"""
+    _ensure_loaded()
+    committed: dict[str, int] = {}
+    with _lock:
+        for res in _resources.values():
+            if _is_guest(res) and not res.get("template"):
+                committed[res["node"]] = committed.get(res["node"], 0) + res.get("maxmem", 0)
+    return committed
+
+
+def get_all_vmids() -> list[int]:
+    _ensure_loaded()
+    with _lock:
+        return list(_node_by_vmid)
+
+
+def get_node_status(node: str) -> dict:
+    """
+    Return /nodes/{node}/status, cached for INVENTORY_TTL.
+    /cluster/resources has no IO-wait, so this is still needed for load decisions.
+    """
+    cached = _node_status.get(node)
+    if cached and time.monotonic() - cached[0] <= INVENTORY_TTL:
+        return cached[1]
+    status = proxmox.nodes(node).status.get()
+    _node_status[node] = (time.monotonic(), status)
+    return status
+
+
+async def get_node_status_async(node: str) -> dict:
+    cached = _node_status.get(node)
+    if cached and time.monotonic() - cached[0] <= INVENTORY_TTL:
+        return cached[1]
+    status = await proxmox_async.get(f"/nodes/{node}/status")
+    _node_status[node] = (time.monotonic(), status)
+    return status
@@ -0,0 +1,158 @@
+import asyncio
+import threading
+import time
+from src.util.env import get_int_env
+from src.util.proxmox_client import proxmox_async
+import src.services.inventory_service as inventory_service
+
+IP_CACHE_TTL = 300  # seconds a resolved address is served from the cache
+IP_RETRY_TTL = 15  # seconds before retrying a guest with no address yet (booting, agent not running)
+IP_REFRESH_INTERVAL = 60  # seconds between background refreshes of running guests
+IP_LOOKUP_CONCURRENCY = get_int_env("IP_LOOKUP_CONCURRENCY", 10)  # guest agent calls in flight per process
+
+# vmid -> (expires, {"ip": ..., "error": ...}); per process, kept warm in the leader by start_refresh_loop()
+_cache: dict[int, tuple[float, dict]] = {}
+_inflight: dict[int, asyncio.Future] = {}
+_lookup_slots: asyncio.Semaphore | None = None
+# vmid -> counter bumped by invalidate(), so a lookup that raced an invalidation of that guest is not stored
+_generations: dict[int, int] = {}
+# invalidate() is also called from sync routes running in the threadpool
+_lock = threading.Lock()
+
+
+def _first_address(addresses: list[str]) -> str | None:
+    for address in addresses:
+        address = address.split("/")[0]
+        # Skip loopback (127.x.x.x or ::1) and link-local IPv6
+        if address.startswith("127.") or address == "::1" or address.lower().startswith("fe80:"):
+            continue
+        return address
+    return None
+
+
+async def _vm_ip(node: str, vmid: int) -> str | None:
+    agent_info = await proxmox_async.get(f"/nodes/{node}/qemu/{vmid}/agent/network-get-interfaces")
+    addresses = [
+        ip["ip-address"]
+        for iface in (agent_info or {}).get("result", [])
+        for ip in iface.get("ip-addresses", [])
+        if ip.get("ip-address")
+    ]
+    # Prefer IPv4, as the guest agent lists IPv6 addresses first on some distributions
+    return _first_address([a for a in addresses if ":" not in a]) or _first_address(addresses)
+
+
+async def _lxc_ip(node: str, vmid: int) -> str | None:
+    interfaces = await proxmox_async.get(f"/nodes/{node}/lxc/{vmid}/interfaces")
+    ipv4 = [iface["inet"] for iface in interfaces or [] if iface.get("name") != "lo" and iface.get("inet")]
+    ipv6 = [iface["inet6"] for iface in interfaces or [] if iface.get("name") != "lo" and iface.get("inet6")]
+    return _first_address(ipv4) or _first_address(ipv6)
+
+
+async def _resolve(guest: dict) -> tuple[float, dict]:
+    global _lookup_slots
+    if _lookup_slots is None:
+        _lookup_slots = asyncio.Semaphore(IP_LOOKUP_CONCURRENCY)
+    vmid, node = guest["vmid"], guest["node"]
+    if guest.get("status") != "running":
+        return IP_RETRY_TTL, {"ip": None, "error": f"Guest is {guest.get('status', 'unknown')}"}
+    async with _lookup_slots:
+        try:
+            if guest.get("type") == "lxc":
+                ip = await _lxc_ip(node, vmid)
+            else:
+                ip = await _vm_ip(node, vmid)
+        except Exception as e:
+            if "agent is not running" in str(e):
+                return IP_RETRY_TTL, {"ip": None, "error": "QEMU agent not running"}
+            return IP_RETRY_TTL, {"ip": None, "error": f"Error retrieving IP '{e}'"}
+    if ip is None:
+        return IP_RETRY_TTL, {"ip": None, "error": "No address reported yet"}
+    return IP_CACHE_TTL, {"ip": ip}
+
+
+def _drop_inflight(vmid: int, future: asyncio.Future):
+    with _lock:
+        if _inflight.get(vmid) is future:
+            del _inflight[vmid]
+
+
+async def _lookup(guest: dict, refresh: bool = False) -> dict:
+    vmid = guest["vmid"]
+    with _lock:
+        cached = _cache.get(vmid)
+        if cached and cached[0] > time.monotonic() and not refresh:
+            return cached[1]
+        generation = _generations.get(vmid, 0)
+        # Concurrent requests for the same guest share one agent call
+        future = _inflight.get(vmid)
+        started = future is None
+        if started:
+            future = asyncio.ensure_future(_resolve(guest))
+            _inflight[vmid] = future
+    if started:
+        future.add_done_callback(lambda done: _drop_inflight(vmid, done))
+    ttl, result = await asyncio.shield(future)
+    with _lock:
+        if _generations.get(vmid, 0) == generation:
+            _cache[vmid] = (time.monotonic() + ttl, result)
+    return result
+
+
+async def get_ips(vmids: list[int]) -> dict[int, dict]:
+    """Resolve the addresses of many VMs and containers concurrently, from the cache where possible"""
+    guests = {
+        guest["vmid"]: guest
+        for guest in await inventory_service.get_vms_async() + await inventory_service.get_lxcs_async()
+    }
+    found = [guests[vmid] for vmid in vmids if vmid in guests]
+    results = await asyncio.gather(*(_lookup(guest) for guest in found))
+    ips = {
+        guest["vmid"]: {"vmid": guest["vmid"], "node": guest["node"], **result}
+        for guest, result in zip(found, results)
+    }
+    for vmid in vmids:
+        if vmid not in guests:
+            ips[vmid] = {"vmid": vmid, "node": None, "ip": None, "error": f"Guest {vmid} not found"}
+    return ips
+
+
+async def get_ip(vmid: int) -> dict:
+    return (await get_ips([vmid]))[vmid]
+
+
+def invalidate(vmid: int):
+    """Forget a guest's address after it was started, stopped, rebooted or migrated"""
+    vmid = int(vmid)
+    with _lock:
+        _generations[vmid] = _generations.get(vmid, 0) + 1
+        _cache.pop(vmid, None)
+        _inflight.pop(vmid, None)  # a lookup already running may have seen the old state
+
+
+async def start_refresh_loop():
+    """
+    Keep the addresses of running guests warm, re-resolving entries that are about to expire.
+    Runs in the leader process only, so guest agent traffic does not grow with the worker count.
+    """
+    while True:
+        await asyncio.sleep(IP_REFRESH_INTERVAL)
+        try:
+            guests = await inventory_service.get_vms_async() + await inventory_service.get_lxcs_async()
+            running = {
+                guest["vmid"]: guest
+                for guest in guests
+                if guest.get("status") == "running" and not guest.get("template")
+            }
+            expiring = time.monotonic() + IP_REFRESH_INTERVAL
+            with _lock:
+                for vmid in list(_cache):
+                    if vmid not in running:
+                        del _cache[vmid]
+                stale = [
+                    guest for vmid, guest in running.items()
+                    if vmid not in _cache or _cache[vmid][0] <= expiring
+                ]
+            await asyncio.gather(*(_lookup(guest, refresh=True) for guest in stale))
+        except Exception as e:
+            print(f"IP refresh failed: {e}")
@@ -100,6 +100,20 @@ def list_users():
             for entry in conn.entries
         ]
 
+def list_group_members(group: str) -> list[str] | None:
+    """List the usernames in an LDAP group, or None if the group does not exist"""
+    gid = GROUP_GID_MAPPING.get(group)
+    if gid is None:
+        return None
+    with get_admin_connection() as conn:
+        conn.search(
+            search_base=LDAP_BASE_DN,
+            search_filter=f"(&(objectClass=posixAccount)(gidNumber={gid}))",
+            search_scope=SUBTREE,
+            attributes=["uid"]
+        )
+        return [entry.uid.value for entry in conn.entries if hasattr(entry, "uid")]
+
 def get_user_info(username: str):
     """Get detailed info for a specific LDAP user"""
     with get_admin_connection() as conn:
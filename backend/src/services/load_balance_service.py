@@ -1,25 +1,81 @@
-import time
+from fastapi import HTTPException
 import src.services.proxmox_service as proxmox_service
-import src.util.proxmox_util as proxmox_util
+import src.services.metrics_sampler as metrics_sampler
+import src.services.inventory_service as inventory_service
+import src.services.rebalance_planner as rebalance_planner
+import src.services.migration_executor as migration_executor
+import src.services.migration_cost as migration_cost
+from src.util.schedule import is_off_peak
+from src.util.leader import cluster_lock
 
-def rebalance():
-    metrics = proxmox_service.get_all_node_metrics()
-    print("Current node metrics:")
-    for node_name, node_metrics in metrics.items():
-        print(f"Node {node_name}: CPU={node_metrics['CPU']:.2f}, MEMORY={node_metrics['Memory']:.2f}, IO_DELAY={node_metrics['IO_Delay']:.2f}")
-    print("Rebalancing nodes based on current load...")
+# A node only counts as overloaded if it stayed above threshold for most of this window:
+# the 25th percentile being over the threshold means 75% of the samples were
+OVERLOAD_WINDOW = 300  # seconds
+OVERLOAD_PERCENTILE = 25
+MAX_REBALANCE_ROUNDS = 5  # plan/execute rounds per rebalance cycle
+
+def sustained_view() -> dict:
+    """Per-node load the node has sustained over OVERLOAD_WINDOW"""
+    return metrics_sampler.get_metrics_view("percentile", p=OVERLOAD_PERCENTILE, seconds=OVERLOAD_WINDOW)
+
+async def _current_metrics() -> tuple[dict, dict]:
+    """Return (smoothed metrics, sustained-load metrics) per node"""
+    await inventory_service.ensure_fresh_async()  # the views read node capacity from the snapshot
+    metrics = metrics_sampler.get_metrics_view("ewma")
+    sustained = sustained_view()
+    if not metrics:
+        # Sampler has not collected anything yet; fall back to a single live reading
+        metrics = await proxmox_service.get_all_node_metrics()
+    return metrics, sustained
+
+async def _migration_costs() -> dict[int, dict]:
+    vms = await inventory_service.get_vms_async()
+    running = [vm for vm in vms if vm.get("status") == "running" and not vm.get("template")]
+    return await migration_cost.estimate_many(running)
+
+def _build_plan(metrics: dict, sustained: dict, costs: dict[int, dict]) -> dict:
+    # Copying local disks saturates the network and storage; only do it off-peak
+    return rebalance_planner.build_plan(
+        metrics, sustained, migration_executor.excluded_vmids(), costs=costs, allow_local_disks=is_off_peak()
+    )
+
+async def get_plan() -> dict:
+    """Compute the migrations the next rebalance would make, without running them"""
+    metrics, sustained = await _current_metrics()
+    return _build_plan(metrics, sustained, await _migration_costs())
+
+async def rebalance():
+    """
+    Plan and run migrations in rounds until the cluster converges or nothing more can be moved.
+    Only one rebalance runs at a time across all processes; raises 409 if another is in progress.
+    """
+    async with cluster_lock("rebalance") as acquired:
+        if not acquired:
+            raise HTTPException(status_code=409, detail="A rebalance is already running")
+        await run_rounds()
+
+
+async def run_rounds():
+    """The rebalance itself, without the cross-process lock; for callers that are the only rebalancer"""
+    metrics, sustained = await _current_metrics()
+    print("Current node metrics (EWMA):")
     for node_name, node_metrics in metrics.items():
-        if proxmox_util.is_overloaded(node_metrics):
-            print(f"[OVERLOAD] Node {node_name} exceeds threshold.")
-            idle_target = proxmox_util.select_idle_target(metrics, exclude_node=node_name)
-            if not idle_target:
-                print(f"No idle node available to migrate VMs from {node_name}")
-                continue
-            vms = proxmox_service.get_running_vms_by_node(node_name)
-            if not vms:
-                continue
-            vmid = vms[0]['vmid']
-            print(f" → Migrating VM {vmid} from {node_name} → {idle_target}")
-            result = proxmox_service.migrate_vm(vmid, node_name, idle_target)
-            print(f"Migration result: {result}")
-            break  # migrate one at a time
\ No newline at end of file
+        print(f"Node {node_name}: CPU={node_metrics.cpu:.2f}, MEMORY={node_metrics.memory:.2f}, IO_DELAY={node_metrics.io_delay:.2f}, DISK={node_metrics.disk:.2f}")
+
+    for round_no in range(1, MAX_REBALANCE_ROUNDS + 1):
+        plan = _build_plan(metrics, sustained, await _migration_costs())
+        if not plan["moves"]:
+            print(f"Cluster balanced after {round_no - 1} round(s).")
+            return
+        print(f"Rebalance round {round_no}: {len(plan['moves'])} migration(s) planned")
+        outcomes = await migration_executor.execute(plan["moves"])
+        done = [move for move, outcome in zip(plan["moves"], outcomes) if outcome["status"] == "succeeded"]
+        # Migrations invalidated the snapshot; reload it without blocking the loop
+        await inventory_service.ensure_fresh_async()
+        if not done:
+            print("No migration succeeded this round; stopping until the next cycle.")
+            return
+        # The sampled averages lag behind; carry the finished moves into the next round's view
+        metrics = rebalance_planner.apply_moves(metrics, done)
+        sustained = rebalance_planner.apply_moves(sustained, done)
+    print(f"Rebalance stopped after {MAX_REBALANCE_ROUNDS} rounds.")
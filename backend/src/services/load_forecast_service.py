@@ -0,0 +1,128 @@
+import asyncio
+from datetime import datetime, timedelta
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert
+from src.util.database import SessionLocal
+from src.util.env import get_int_env
+from src.models.db_models import NodeLoadProfile, utcnow
+from src.models.metrics import NodeMetrics
+import src.services.metrics_sampler as metrics_sampler
+
+PROFILE_ALPHA = 0.3  # weight of the newest week when folding an hour into its profile slot
+VM_LIFETIME_HOURS = get_int_env("VM_LIFETIME_HOURS", 3)  # how far ahead placement looks
+
+_profiles: dict[str, dict[int, NodeMetrics]] = {}  # node -> hour_of_week -> average load
+
+
+def hour_of_week(when: datetime) -> int:
+    return when.weekday() * 24 + when.hour
+
+
+def load_profiles():
+    """Reload the in-memory profiles from the database"""
+    global _profiles
+    profiles: dict[str, dict[int, NodeMetrics]] = {}
+    with SessionLocal() as db:
+        for row in db.execute(select(NodeLoadProfile)).scalars():
+            profiles.setdefault(row.node, {})[row.hour_of_week] = NodeMetrics(row.node, row.cpu, row.memory, row.io_delay)
+    _profiles = profiles
+
+
+def record_hour(slot: int, observed: dict[str, NodeMetrics]):
+    """Fold one hour of observed averages into the profile slot of every node"""
+    with SessionLocal() as db:
+        for node, m in observed.items():
+            stmt = insert(NodeLoadProfile).values(
+                node=node, hour_of_week=slot, cpu=m.cpu, memory=m.memory, io_delay=m.io_delay, samples=1,
+            )
+            db.execute(stmt.on_conflict_do_update(
+                index_elements=["node", "hour_of_week"],
+                set_={
+                    "cpu": NodeLoadProfile.cpu + PROFILE_ALPHA * (stmt.excluded.cpu - NodeLoadProfile.cpu),
+                    "memory": NodeLoadProfile.memory + PROFILE_ALPHA * (stmt.excluded.memory - NodeLoadProfile.memory),
+                    "io_delay": NodeLoadProfile.io_delay + PROFILE_ALPHA * (stmt.excluded.io_delay - NodeLoadProfile.io_delay),
+                    "samples": NodeLoadProfile.samples + 1,
+                    "updated_at": utcnow(),
+                },
+            ))
+        db.commit()
+
+
+def forecast(node: str, start: datetime | None = None, hours: float = VM_LIFETIME_HOURS) -> NodeMetrics | None:
+    """
+    Expected average load of a node over [start, start + hours), from its hour-of-week profile.
+    Each hour slot counts by how much of it the window covers. None if a slot has no history yet.
+    """
+    profile = _profiles.get(node)
+    if not profile:
+        return None
+    start = start or datetime.now()
+    end = start + timedelta(hours=hours)
+    cursor = start
+    totals = [0.0, 0.0, 0.0]
+    covered = 0.0
+    while cursor < end:
+        next_hour = cursor.replace(minute=0, second=0, microsecond=0) + timedelta(hours=1)
+        weight = (min(next_hour, end) - cursor).total_seconds()
+        slot = profile.get(hour_of_week(cursor))
+        if slot is None:
+            return None
+        totals[0] += slot.cpu * weight
+        totals[1] += slot.memory * weight
+        totals[2] += slot.io_delay * weight
+        covered += weight
+        cursor = next_hour
+    if not covered:
+        return None
+    return NodeMetrics(node, totals[0] / covered, totals[1] / covered, totals[2] / covered)
+
+
+def forecast_all(nodes, start: datetime | None = None, hours: float = VM_LIFETIME_HOURS) -> dict[str, NodeMetrics]:
+    """Forecasts for the nodes that have history covering the window"""
+    expected = {}
+    for node in nodes:
+        m = forecast(node, start, hours)
+        if m is not None:
+            expected[node] = m
+    return expected
+
+
+def _observed_last_hour() -> dict[str, NodeMetrics]:
+    observed = {}
+    for node in metrics_sampler.get_nodes():
+        series = metrics_sampler.get_series(node)
+        values = [series.window(field, 3600) for field in metrics_sampler.FIELDS]
+        if not all(values):
+            continue
+        cpu, mem, iowait = (sum(v) / len(v) for v in values)
+        observed[node] = NodeMetrics(node, cpu, mem, iowait)
+    return observed
+
+
+async def _sleep_until_next_hour(offset: float):
+    now = datetime.now()
+    next_hour = now.replace(minute=0, second=0, microsecond=0) + timedelta(hours=1)
+    await asyncio.sleep((next_hour - now).total_seconds() + offset)
+
+
+async def start_profile_writer():
+    """At the end of every local hour, fold that hour's sampled averages into the profiles (leader only)"""
+    while True:
+        await _sleep_until_next_hour(5)
+        finished_slot = hour_of_week(datetime.now() - timedelta(hours=1))
+        try:
+            observed = _observed_last_hour()
+            if observed:
+                await asyncio.to_thread(record_hour, finished_slot, observed)
+        except Exception as e:
+            print(f"Updating node load profiles failed: {e}")
+
+
+async def start_profile_loop():
+    """Load the profiles now and again shortly after the leader has written each hour"""
+    while True:
+        try:
+            await asyncio.to_thread(load_profiles)
+        except Exception as e:
+            print(f"Loading node load profiles failed: {e}")
+        await _sleep_until_next_hour(60)
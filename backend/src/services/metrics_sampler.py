@@ -0,0 +1,215 @@
+import asyncio
+import math
+import time
+from array import array
+from src.util.proxmox_client import proxmox_async
+from src.models.metrics import NodeMetrics
+import src.services.inventory_service as inventory_service
+
+SAMPLE_INTERVAL = 10  # seconds between node status samples
+WINDOW_SIZE = 360  # samples kept per node (one hour at SAMPLE_INTERVAL)
+EWMA_ALPHA = 0.2
+FIELDS = ("cpu", "mem", "iowait")  # all stored as percentages
+
+clock = time.time  # replaced by the simulator to replay traces in virtual time
+
+
+class NodeSeries:
+    """Fixed-size ring buffer of one node's samples, stored in flat arrays"""
+
+    __slots__ = ("capacity", "times", "values", "ewma", "head", "count")
+
+    def __init__(self, capacity: int = WINDOW_SIZE):
+        self.capacity = capacity
+        self.times = array("d", bytes(8 * capacity))
+        self.values = {field: array("f", bytes(4 * capacity)) for field in FIELDS}
+        self.ewma = {field: math.nan for field in FIELDS}
+        self.head = 0  # next slot to write
+        self.count = 0
+
+    def append(self, timestamp: float, cpu: float, mem: float, iowait: float):
+        for field, value in zip(FIELDS, (cpu, mem, iowait)):
+            self.values[field][self.head] = value
+            previous = self.ewma[field]
+            self.ewma[field] = value if math.isnan(previous) else EWMA_ALPHA * value + (1 - EWMA_ALPHA) * previous
+        self.times[self.head] = timestamp
+        self.head = (self.head + 1) % self.capacity
+        self.count = min(self.count + 1, self.capacity)
+
+    def window(self, field: str, seconds: float | None = None) -> list[float]:
+        """Return the samples of a field in chronological order, optionally only the last N seconds"""
+        since = clock() - seconds if seconds else -math.inf
+        first = (self.head - self.count) % self.capacity
+        values = self.values[field]
+        out = []
+        for i in range(self.count):
+            slot = (first + i) % self.capacity
+            if self.times[slot] >= since:
+                out.append(values[slot])
+        return out
+
+    def percentile(self, field: str, p: float, seconds: float | None = None) -> float | None:
+        samples = sorted(self.window(field, seconds))
+        if not samples:
+            return None
+        rank = (len(samples) - 1) * p / 100
+        low, high = math.floor(rank), math.ceil(rank)
+        return samples[low] + (samples[high] - samples[low]) * (rank - low)
+
+    def last(self, field: str) -> float | None:
+        if not self.count:
+            return None
+        return self.values[field][(self.head - 1) % self.capacity]
+
+
+_series: dict[str, NodeSeries] = {}
+_latest_status: dict[str, dict] = {}  # last raw /nodes/{node}/status per node
+_listeners: list = []  # called with no arguments after every sampling round
+
+
+def record(node: str, timestamp: float, cpu: float, mem: float, iowait: float):
+    series = _series.get(node)
+    if series is None:
+        series = _series[node] = NodeSeries()
+    series.append(timestamp, cpu, mem, iowait)
+
+
+def add_listener(callback):
+    """Register a callback to run after every sampling round"""
+    _listeners.append(callback)
+
+
+def _notify():
+    for callback in _listeners:
+        try:
+            callback()
+        except Exception as e:
+            print(f"Metrics listener failed: {e}")
+
+
+def clear():
+    """Forget all samples"""
+    _series.clear()
+    _latest_status.clear()
+
+
+def get_latest_status(node: str) -> dict | None:
+    """The node status returned by the most recent sampling round"""
+    return _latest_status.get(node)
+
+
+def get_nodes() -> list[str]:
+    return list(_series)
+
+
+def get_series(node: str) -> NodeSeries | None:
+    return _series.get(node)
+
+
+def get_ewma(node: str, field: str) -> float | None:
+    series = _series.get(node)
+    if not series or not series.count:
+        return None
+    return series.ewma[field]
+
+
+def get_percentile(node: str, field: str, p: float, seconds: float | None = None) -> float | None:
+    series = _series.get(node)
+    return series.percentile(field, p, seconds) if series else None
+
+
+def get_metrics_view(kind: str = "ewma", p: float = 50, seconds: float | None = None) -> dict[str, NodeMetrics]:
+    """
+    Per-node metrics for placement and rebalancing.
+    kind "ewma" gives the smoothed level, "percentile" the p-th percentile over the last `seconds`.
+    Disk usage and committed memory change slowly and are taken from the inventory as is.
+    """
+    nodes = {node["node"]: node for node in inventory_service.get_nodes()}
+    committed = inventory_service.get_committed_memory()
+    view = {}
+    for node, series in _series.items():
+        if not series.count:
+            continue
+        if kind == "ewma":
+            values = {field: series.ewma[field] for field in FIELDS}
+        else:
+            values = {field: series.percentile(field, p, seconds) for field in FIELDS}
+        if any(value is None for value in values.values()):
+            continue
+        info = nodes.get(node, {})
+        view[node] = NodeMetrics(
+            node,
+            values["cpu"],
+            values["mem"],
+            values["iowait"],
+            disk=info["disk"] / info["maxdisk"] * 100 if info.get("maxdisk") else 0.0,
+            mem_committed=committed.get(node, 0),
+            mem_total=info.get("maxmem", 0),
+        )
+    return view
+
+
+async def get_metrics_view_async(kind: str = "ewma", p: float = 50, seconds: float | None = None) -> dict[str, NodeMetrics]:
+    """get_metrics_view() for async callers: reloads a stale inventory without blocking the loop"""
+    await inventory_service.ensure_fresh_async()
+    return get_metrics_view(kind, p, seconds)
+
+
+async def _seed_node(node: str):
+    """Fill a node's buffer with the last hour of RRD averages"""
+    rows = await proxmox_async.get(f"/nodes/{node}/rrddata", timeframe="hour", cf="AVERAGE")
+    for row in sorted(rows or [], key=lambda r: r.get("time", 0)):
+        if row.get("cpu") is None or not row.get("memtotal") or row.get("iowait") is None:
+            continue  # RRD rows are empty while a node was down
+        record(
+            node,
+            float(row["time"]),
+            row["cpu"] * 100,
+            row["memused"] / row["memtotal"] * 100,
+            row["iowait"] * 100,
+        )
+
+
+async def _sample_node(node: str):
+    status = await proxmox_async.get(f"/nodes/{node}/status")
+    _latest_status[node] = status
+    memory = status.get("memory", {})
+    if not memory.get("total"):
+        return
+    record(
+        node,
+        clock(),
+        status.get("cpu", 0.0) * 100,
+        memory.get("used", 0) / memory["total"] * 100,
+        status.get("wait", 0.0) * 100,
+    )
+
+
+async def _online_nodes() -> list[str]:
+    return [node["node"] for node in await inventory_service.get_nodes_async() if node.get("status") == "online"]
+
+
+async def start_sampler():
+    """Seed every node from rrddata, then sample node status every SAMPLE_INTERVAL seconds"""
+    try:
+        nodes = await _online_nodes()
+        results = await asyncio.gather(*(_seed_node(node) for node in nodes), return_exceptions=True)
+        for node, result in zip(nodes, results):
+            if isinstance(result, Exception):
+                print(f"Seeding metrics for {node} failed: {result}")
+    except Exception as e:
+        print(f"Seeding node metrics failed: {e}")
+
+    while True:
+        try:
+            nodes = await _online_nodes()
+            results = await asyncio.gather(*(_sample_node(node) for node in nodes), return_exceptions=True)
+            for node, result in zip(nodes, results):
+                if isinstance(result, Exception):
+                    print(f"Sampling metrics for {node} failed: {result}")
+            # Listeners build metrics views, which read the inventory synchronously
+            await inventory_service.ensure_fresh_async()
+            _notify()
+        except Exception as e:
+            print(f"Sampling node metrics failed: {e}")
+        await asyncio.sleep(SAMPLE_INTERVAL)
@@ -0,0 +1,77 @@
+import asyncio
+import time
+from src.util.env import get_int_env
+from src.util.proxmox_client import proxmox_async
+import src.util.proxmox_util as proxmox_util
+import src.services.inventory_service as inventory_service
+
+MIGRATION_BANDWIDTH = get_int_env("MIGRATION_BANDWIDTH", 110) * 1024 ** 2  # bytes per second (MiB/s in the env)
+DISK_CONFIG_TTL = 300  # seconds a VM's parsed disk layout is cached
+
+_disk_cache: dict[int, tuple[float, list[dict]]] = {}  # vmid -> (monotonic fetch time, disks)
+
+
+async def get_vm_disks(node: str, vmid: int) -> list[dict]:
+    """Parsed disks of a qemu VM (see proxmox_util.parse_vm_disks), cached for DISK_CONFIG_TTL"""
+    cached = _disk_cache.get(vmid)
+    if cached and time.monotonic() - cached[0] < DISK_CONFIG_TTL:
+        return cached[1]
+    config = await proxmox_async.get(f"/nodes/{node}/qemu/{vmid}/config")
+    disks = proxmox_util.parse_vm_disks(config or {})
+    _disk_cache[vmid] = (time.monotonic(), disks)
+    return disks
+
+
+async def get_shared_storages() -> set[str]:
+    return {
+        res["storage"] for res in await inventory_service.get_resources_async("storage")
+        if res.get("shared") and "storage" in res
+    }
+
+
+def _estimate(vm: dict, disks: list[dict], shared: set[str]) -> dict:
+    local = [disk for disk in disks if disk["storage"] not in shared]
+    local_bytes = sum(disk["size"] or 0 for disk in local)
+    running = vm.get("status") == "running"
+    # A live migration copies the guest's RAM; an offline one only the disks
+    memory_bytes = vm.get("mem", 0) if running else 0
+    transfer = memory_bytes + local_bytes
+    return {
+        "vmid": int(vm["vmid"]),
+        "node": vm.get("node"),
+        "online": running,
+        "with_local_disks": bool(local),
+        "local_disks": [disk["key"] for disk in local],
+        "local_disk_bytes": local_bytes,
+        "shared_disk_bytes": sum(disk["size"] or 0 for disk in disks if disk["storage"] in shared),
+        "memory_bytes": memory_bytes,
+        "transfer_bytes": transfer,
+        "estimated_seconds": round(transfer / MIGRATION_BANDWIDTH, 1),
+    }
+
+
+async def estimate(vmid: int) -> dict:
+    """Estimate the transfer size and time of migrating a qemu VM"""
+    vm = next((vm for vm in await inventory_service.get_vms_async() if int(vm["vmid"]) == vmid), None)
+    if vm is None:
+        return {"error": f"VM {vmid} not found"}
+    try:
+        disks, shared = await asyncio.gather(get_vm_disks(vm["node"], vmid), get_shared_storages())
+    except Exception as e:
+        return {"error": str(e)}
+    return _estimate(vm, disks, shared)
+
+
+async def estimate_many(vms: list[dict]) -> dict[int, dict]:
+    """Estimates keyed by VMID; VMs whose config cannot be read are left out"""
+    shared = await get_shared_storages()
+    results = await asyncio.gather(
+        *(get_vm_disks(vm["node"], int(vm["vmid"])) for vm in vms), return_exceptions=True
+    )
+    estimates = {}
+    for vm, disks in zip(vms, results):
+        if isinstance(disks, Exception):
+            print(f"Could not read disk layout of VM {vm['vmid']}: {disks}")
+            continue
+        estimates[int(vm["vmid"])] = _estimate(vm, disks, shared)
+    return estimates
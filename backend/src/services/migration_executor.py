@@ -0,0 +1,80 @@
+import asyncio
+import contextlib
+import time
+from src.util.env import get_int_env
+import src.util.proxmox_util as proxmox_util
+import src.services.proxmox_service as proxmox_service
+import src.services.inventory_service as inventory_service
+
+MIGRATION_MAX_CONCURRENT = get_int_env("MIGRATION_MAX_CONCURRENT", 4)  # cluster-wide
+MIGRATION_MAX_PER_SOURCE = get_int_env("MIGRATION_MAX_PER_SOURCE", 1)
+MIGRATION_MAX_PER_TARGET = get_int_env("MIGRATION_MAX_PER_TARGET", 2)
+MIGRATION_MAX_LOCAL_DISK = get_int_env("MIGRATION_MAX_LOCAL_DISK", 1)  # cluster-wide moves copying local disks
+MIGRATION_TIMEOUT = 1800  # seconds
+FAILED_MIGRATION_COOLDOWN = 3600  # seconds a VM is left alone after a failed migration
+
+_cluster_slots: asyncio.Semaphore | None = None
+_local_disk_slots: asyncio.Semaphore | None = None
+_source_slots: dict[str, asyncio.Semaphore] = {}
+_target_slots: dict[str, asyncio.Semaphore] = {}
+_in_flight: set[int] = set()
+_failed_at: dict[int, float] = {}  # vmid -> time.monotonic() of the last failure
+
+
+def _slots(pool: dict[str, asyncio.Semaphore], node: str, limit: int) -> asyncio.Semaphore:
+    if node not in pool:
+        pool[node] = asyncio.Semaphore(limit)
+    return pool[node]
+
+
+def excluded_vmids() -> set[int]:
+    """VMs the planner should leave alone: migrating now, or failed recently"""
+    now = time.monotonic()
+    for vmid, failed_at in list(_failed_at.items()):
+        if now - failed_at > FAILED_MIGRATION_COOLDOWN:
+            del _failed_at[vmid]
+    return _in_flight | _failed_at.keys()
+
+
+async def _run_move(move: dict) -> dict:
+    global _cluster_slots, _local_disk_slots
+    if _cluster_slots is None:
+        _cluster_slots = asyncio.Semaphore(MIGRATION_MAX_CONCURRENT)
+        _local_disk_slots = asyncio.Semaphore(MIGRATION_MAX_LOCAL_DISK)
+    vmid, source, target = move["vmid"], move["source"], move["target"]
+    with_local_disks = move.get("with_local_disks", True)
+    outcome = {"vmid": vmid, "source": source, "target": target, "upid": None}
+    # Give long disk copies more time than the default, going by the estimate
+    timeout = max(MIGRATION_TIMEOUT, 2 * (move.get("estimated_seconds") or 0))
+
+    async with _slots(_source_slots, source, MIGRATION_MAX_PER_SOURCE), \
+            _slots(_target_slots, target, MIGRATION_MAX_PER_TARGET), \
+            (_local_disk_slots if with_local_disks else contextlib.nullcontext()), \
+            _cluster_slots:
+        _in_flight.add(vmid)
+        try:
+            print(f" → Migrating VM {vmid} from {source} → {target}")
+            result = await asyncio.to_thread(
+                proxmox_service.migrate_vm, vmid, source, target, move.get("online", True), with_local_disks
+            )
+            if "error" in result:
+                raise RuntimeError(result["error"])
+            outcome["upid"] = result["data"]
+            await proxmox_util.wait_for_task_completion(outcome["upid"], timeout=timeout)
+            outcome["status"] = "succeeded"
+            _failed_at.pop(vmid, None)
+        except Exception as e:
+            outcome["status"] = "failed"
+            outcome["error"] = str(e)
+            _failed_at[vmid] = time.monotonic()
+        finally:
+            _in_flight.discard(vmid)
+            inventory_service.invalidate()
+
+    print(f"Migration of VM {vmid} {outcome['status']}" + (f": {outcome['error']}" if "error" in outcome else ""))
+    return outcome
+
+
+async def execute(moves: list[dict]) -> list[dict]:
+    """Run the planned moves concurrently within the per-node and cluster limits; return one outcome per move"""
+    return list(await asyncio.gather(*(_run_move(move) for move in moves)))
@@ -0,0 +1,124 @@
+import asyncio
+import json
+from fastapi import Request
+import src.services.metrics_sampler as metrics_sampler
+import src.services.inventory_service as inventory_service
+import src.services.proxmox_service as proxmox_service
+
+STREAM_KEEPALIVE = 15  # seconds between SSE comments on an idle stream
+
+# Streams reuse the node status the metrics sampler already fetches every SAMPLE_INTERVAL,
+# so upstream load does not depend on how many dashboards are open.
+_subscribers: dict[str, set[asyncio.Event]] = {}  # node -> one wake-up event per open stream
+_snapshots: dict[str, dict] = {}  # node -> latest published snapshot
+_publish_task: asyncio.Task | None = None
+
+
+def _vm_performance(vm: dict) -> dict:
+    maxmem = vm.get("maxmem", 0)
+    return {
+        "Name": vm.get("name", ""),
+        "Status": vm.get("status", "unknown"),
+        "CPU Usage": f"{vm.get('cpu', 0.0) * 100:.2f}%",
+        "Memory Usage": f"{vm.get('mem', 0) / maxmem * 100:.1f}%" if maxmem else "N/A",
+    }
+
+
+def _snapshot(node: str, vms: list[dict]) -> dict | None:
+    """The node performance summary plus its VMs, built from the latest sample"""
+    status = metrics_sampler.get_latest_status(node)
+    if status is None:
+        return None
+    snapshot = proxmox_service.format_node_performance(status)
+    snapshot["VMs"] = {
+        str(vm["vmid"]): _vm_performance(vm)
+        for vm in vms
+        if vm.get("node") == node and not vm.get("template")
+    }
+    return snapshot
+
+
+def _delta(old: dict, new: dict) -> dict:
+    """Keys of new that differ from old, recursing into nested dicts; removed keys map to None"""
+    delta = {}
+    for key, value in new.items():
+        previous = old.get(key)
+        if isinstance(value, dict) and isinstance(previous, dict):
+            nested = _delta(previous, value)
+            if nested:
+                delta[key] = nested
+        elif key not in old or value != previous:
+            delta[key] = value
+    for key in old.keys() - new.keys():
+        delta[key] = None
+    return delta
+
+
+def _event(kind: str, data: dict) -> str:
+    return f"event: {kind}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n"
+
+
+async def _publish():
+    try:
+        vms = await inventory_service.get_vms_async()
+    except Exception as e:
+        print(f"Publishing performance streams failed: {e}")
+        return
+    for node, waiters in list(_subscribers.items()):
+        snapshot = _snapshot(node, vms)
+        if snapshot is None:
+            continue
+        _snapshots[node] = snapshot
+        for wake in waiters:
+            wake.set()
+
+
+def _on_sample():
+    global _publish_task
+    if _subscribers and (_publish_task is None or _publish_task.done()):
+        _publish_task = asyncio.ensure_future(_publish())
+
+
+async def has_node(node: str) -> bool:
+    return any(n["node"] == node for n in await inventory_service.get_nodes_async())
+
+
+async def stream(node: str, request: Request):
+    """
+    Server-sent events for one node: a "snapshot" event with the full summary, then a "delta"
+    event with only the changed fields after every sampling round. A null value removes a key.
+    """
+    wake = asyncio.Event()
+    _subscribers.setdefault(node, set()).add(wake)
+    try:
+        sent = _snapshot(node, await inventory_service.get_vms_async())
+        if sent is not None:
+            yield _event("snapshot", sent)
+        while not await request.is_disconnected():
+            try:
+                await asyncio.wait_for(wake.wait(), STREAM_KEEPALIVE)
+            except asyncio.TimeoutError:
+                yield ": keep-alive\n\n"
+                continue
+            wake.clear()
+            current = _snapshots.get(node)
+            if current is None:
+                continue
+            if sent is None:
+                yield _event("snapshot", current)
+            else:
+                delta = _delta(sent, current)
+                if delta:
+                    yield _event("delta", delta)
+            sent = current
+    finally:
+        waiters = _subscribers.get(node, set())
+        waiters.discard(wake)
+        if not waiters:
+            _subscribers.pop(node, None)
+            _snapshots.pop(node, None)
+
+
+def start():
+    """Publish to open streams after every metrics sampling round"""
+    metrics_sampler.add_listener(_on_sample)
@@ -0,0 +1,102 @@
+import os
+from src.models.metrics import NodeMetrics
+
+# Hard constraints: a node above any of these never receives a VM and counts as overloaded
+CPU_THRESHOLD = float(os.getenv("PLACEMENT_MAX_CPU", 80))  # percent
+MEM_THRESHOLD = float(os.getenv("PLACEMENT_MAX_MEMORY", 80))
+IO_DELAY_THRESHOLD = float(os.getenv("PLACEMENT_MAX_IO_DELAY", 80))
+DISK_THRESHOLD = float(os.getenv("PLACEMENT_MAX_DISK", 90))
+# Guest maxmem a node may carry, as a multiple of its physical memory (stopped and ballooned VMs included)
+OVERCOMMIT_RATIO = float(os.getenv("OVERCOMMIT_RATIO", 1.2))
+
+# Soft score: weighted sum of usage, lowest wins
+PLACEMENT_WEIGHTS = {
+    "cpu": float(os.getenv("PLACEMENT_WEIGHT_CPU", 4)),
+    "memory": float(os.getenv("PLACEMENT_WEIGHT_MEMORY", 3)),
+    "disk": float(os.getenv("PLACEMENT_WEIGHT_DISK", 2)),
+    "io_delay": float(os.getenv("PLACEMENT_WEIGHT_IO_DELAY", 1)),
+}
+# How much the forecast load over the VM's lifetime counts, relative to the current load
+PLACEMENT_WEIGHT_FORECAST = float(os.getenv("PLACEMENT_WEIGHT_FORECAST", 1))
+
+
+def violations(m: NodeMetrics) -> list[str]:
+    """Names of the hard constraints the node currently breaks; such a node receives no VMs"""
+    limits = (
+        ("cpu", m.cpu, CPU_THRESHOLD),
+        ("memory", m.memory, MEM_THRESHOLD),
+        ("io_delay", m.io_delay, IO_DELAY_THRESHOLD),
+        ("disk", m.disk, DISK_THRESHOLD),
+        ("committed memory", m.committed, OVERCOMMIT_RATIO * 100),
+    )
+    return [name for name, value, limit in limits if value > limit]
+
+
+def load_violations(m: NodeMetrics) -> list[str]:
+    """
+    The broken constraints that migrating VMs away can fix. Root filesystem usage is left out:
+    guest disks live on VM storage, so a node with a full rootfs stays full however much moves off it.
+    """
+    return [name for name in violations(m) if name != "disk"]
+
+
+def can_host(m: NodeMetrics, vm_maxmem: int) -> bool:
+    """Whether committing vm_maxmem more to the node stays within OVERCOMMIT_RATIO"""
+    return not m.mem_total or m.mem_committed + vm_maxmem <= OVERCOMMIT_RATIO * m.mem_total
+
+
+def is_overloaded(m: NodeMetrics) -> bool:
+    """Whether the node should shed load; use violations() to decide whether it may receive a VM"""
+    return bool(load_violations(m))
+
+
+def score(m: NodeMetrics, expected: NodeMetrics | None = None) -> dict[str, float]:
+    """Per-metric weighted contributions plus their total; expected adds a forecast term"""
+    breakdown = {name: weight * getattr(m, name) for name, weight in PLACEMENT_WEIGHTS.items()}
+    if expected is not None:
+        # Disk usage is not forecast; it is already counted from the current reading
+        breakdown["forecast"] = PLACEMENT_WEIGHT_FORECAST * sum(
+            weight * getattr(expected, name) for name, weight in PLACEMENT_WEIGHTS.items() if name != "disk"
+        )
+    breakdown["total"] = sum(breakdown.values())
+    return breakdown
+
+
+def _format(breakdown: dict[str, float]) -> str:
+    parts = ", ".join(f"{name}={value:.1f}" for name, value in breakdown.items() if name != "total")
+    return f"{breakdown['total']:.1f} ({parts})"
+
+
+def choose_node(
+    metrics: dict[str, NodeMetrics],
+    exclude: set[str] | None = None,
+    purpose: str = "placement",
+    forecast: dict[str, NodeMetrics] | None = None,
+    vm_maxmem: int = 0,
+) -> str | None:
+    """
+    Return the lowest-scoring node that meets every hard constraint and can host vm_maxmem, logging the decision.
+    The forecast term is only used when every candidate has a forecast, so nodes without history are not favoured.
+    """
+    candidates = []
+    for node, m in sorted(metrics.items()):
+        if node in (exclude or ()):
+            continue
+        broken = violations(m)
+        if broken:
+            print(f"[{purpose}] {node} rejected: over {', '.join(broken)} threshold")
+            continue
+        if not can_host(m, vm_maxmem):
+            print(f"[{purpose}] {node} rejected: cannot commit {vm_maxmem / 1024 ** 3:.1f} GiB more memory")
+            continue
+        candidates.append((node, m))
+    if not candidates:
+        print(f"[{purpose}] no node meets the placement constraints")
+        return None
+    use_forecast = bool(forecast) and all(node in forecast for node, _ in candidates)
+    scored = [(score(m, forecast[node] if use_forecast else None), node) for node, m in candidates]
+    for breakdown, node in scored:
+        print(f"[{purpose}] {node} score {_format(breakdown)}")
+    best = min(scored, key=lambda item: item[0]["total"])[1]
+    print(f"[{purpose}] chose {best}")
+    return best
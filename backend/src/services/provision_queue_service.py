@@ -0,0 +1,238 @@
+import asyncio
+import time
+import uuid
+from datetime import timedelta
+from fastapi import HTTPException
+from sqlalchemy import select, func, text, update
+from src.util.database import SessionLocal
+from src.util.env import get_int_env
+from src.models.db_models import ProvisionJob, utcnow
+from src.models.models import ProvisionRequest
+import src.services.proxmox_service as proxmox_service
+import src.util.provision_worker as provision_worker
+import src.util.response_cache as response_cache
+
+PROVISION_WORKERS = get_int_env("PROVISION_WORKERS", 4)  # worker loops per process
+PROVISION_MAX_CONCURRENT = get_int_env("PROVISION_MAX_CONCURRENT", 10)  # running jobs across all processes
+PROVISION_MAX_PER_NODE = get_int_env("PROVISION_MAX_PER_NODE", 3)
+PROVISION_POLL_INTERVAL = 2  # seconds between queue polls when idle
+JOB_STALE_AFTER = timedelta(hours=1)  # running jobs without progress for this long are failed
+PLACEMENT_TIMEOUT = 600  # seconds a job waits for a node with a free slot and enough memory
+
+# Advisory lock serialising job claims and node assignment across processes
+_QUEUE_LOCK_KEY = 7_301_001
+
+_job_available: asyncio.Event | None = None
+
+
+def _job_to_dict(job: ProvisionJob) -> dict:
+    return {
+        "job_id": job.id,
+        "status": job.status,
+        "stage": job.stage,
+        "node": job.node,
+        "result": job.result,
+        "error": job.error,
+        "requested_by": job.requested_by,
+        "created_at": job.created_at,
+        "updated_at": job.updated_at,
+        "finished_at": job.finished_at,
+    }
+
+
+def enqueue(req: ProvisionRequest, requested_by: str | None = None) -> dict:
+    """Persist a new provisioning job and return it"""
+    with SessionLocal() as db:
+        job = ProvisionJob(
+            id=str(uuid.uuid4()),
+            status="queued",
+            stage="queued",
+            request=req.model_dump(mode="json"),
+            requested_by=requested_by,
+        )
+        db.add(job)
+        db.commit()
+        db.refresh(job)
+        return _job_to_dict(job)
+
+
+async def submit(req: ProvisionRequest, requested_by: str | None = None) -> dict:
+    """Enqueue a job and wake an idle worker in this process"""
+    job = await asyncio.to_thread(enqueue, req, requested_by)
+    if _job_available is not None:
+        _job_available.set()
+    return job
+
+
+def get_job(job_id: str) -> dict | None:
+    with SessionLocal() as db:
+        job = db.get(ProvisionJob, job_id)
+        return _job_to_dict(job) if job else None
+
+
+def _update_job(job_id: str, **fields) -> bool:
+    """Update a running job; return False if it is no longer running (e.g. failed as stale)"""
+    with SessionLocal() as db:
+        updated = db.execute(
+            update(ProvisionJob)
+            .where(ProvisionJob.id == job_id, ProvisionJob.status == "running")
+            .values(updated_at=utcnow(), **fields)
+        ).rowcount
+        db.commit()
+        return updated > 0
+
+
+def _finish_job(job_id: str, status: str, result: dict | None = None, error: str | None = None):
+    _update_job(
+        job_id,
+        status=status,
+        stage="done" if status == "succeeded" else "failed",
+        result=result,
+        error=error,
+        request=None,
+        finished_at=utcnow(),
+    )
+    if status == "succeeded":
+        response_cache.invalidate("proxmox/vms", "dashboard")  # the new VM should show up on the next list
+
+
+def _claim_next_job() -> tuple[str, dict] | None:
+    """Atomically move the oldest queued job to running, respecting the global limit"""
+    with SessionLocal() as db:
+        db.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": _QUEUE_LOCK_KEY})
+
+        stale_before = utcnow() - JOB_STALE_AFTER
+        db.execute(
+            update(ProvisionJob)
+            .where(ProvisionJob.status == "running", ProvisionJob.updated_at < stale_before)
+            .values(
+                status="failed",
+                stage="failed",
+                error="Worker stopped before the job finished",
+                request=None,
+                finished_at=utcnow(),
+            )
+        )
+
+        running = db.scalar(
+            select(func.count()).select_from(ProvisionJob).where(ProvisionJob.status == "running")
+        )
+        if running >= PROVISION_MAX_CONCURRENT:
+            db.commit()
+            return None
+
+        job = db.execute(
+            select(ProvisionJob)
+            .where(ProvisionJob.status == "queued")
+            .order_by(ProvisionJob.created_at)
+            .limit(1)
+            .with_for_update(skip_locked=True)
+        ).scalar_one_or_none()
+        if job is None:
+            db.commit()
+            return None
+
+        job.status = "running"
+        job.stage = "placing"
+        job.updated_at = utcnow()
+        claimed = (job.id, job.request)
+        db.commit()
+        return claimed
+
+
+def _nodes_at_limit() -> set[str]:
+    with SessionLocal() as db:
+        rows = db.execute(
+            select(ProvisionJob.node)
+            .where(ProvisionJob.status == "running", ProvisionJob.node.is_not(None))
+            .group_by(ProvisionJob.node)
+            .having(func.count() >= PROVISION_MAX_PER_NODE)
+        )
+        return {row[0] for row in rows}
+
+
+def _assign_node(job_id: str, node: str) -> bool:
+    """Bind a job to a node if the node still has a free provisioning slot"""
+    with SessionLocal() as db:
+        db.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": _QUEUE_LOCK_KEY})
+        running_on_node = db.scalar(
+            select(func.count()).select_from(ProvisionJob)
+            .where(ProvisionJob.status == "running", ProvisionJob.node == node)
+        )
+        if running_on_node >= PROVISION_MAX_PER_NODE:
+            db.commit()
+            return False
+        db.execute(
+            update(ProvisionJob).where(ProvisionJob.id == job_id).values(node=node, updated_at=utcnow())
+        )
+        db.commit()
+        return True
+
+
+async def _place_job(job_id: str, vm_maxmem: int) -> str:
+    """
+    Pick the best node that has a free slot and room for the VM's memory, waiting up to
+    PLACEMENT_TIMEOUT for one to free up. Gives up as soon as the job stops running.
+    """
+    deadline = time.monotonic() + PLACEMENT_TIMEOUT
+    while True:
+        # Also refreshes updated_at, so a job that is waiting is not failed as stale
+        if not await asyncio.to_thread(_update_job, job_id, stage="placing"):
+            raise RuntimeError(f"Provision job {job_id} is no longer running")
+        if time.monotonic() > deadline:
+            raise HTTPException(
+                status_code=503,
+                detail=f"No node had a free provisioning slot and {vm_maxmem // 1024 ** 2} MiB of memory "
+                       f"to spare within {PLACEMENT_TIMEOUT} seconds",
+            )
+        busy = await asyncio.to_thread(_nodes_at_limit)
+        node = await proxmox_service.pick_best_node(exclude=busy, vm_maxmem=vm_maxmem)
+        if node and await asyncio.to_thread(_assign_node, job_id, node):
+            return node
+        await asyncio.sleep(PROVISION_POLL_INTERVAL)
+
+
+async def _run_job(job_id: str, request: dict):
+    async def report(stage: str):
+        await asyncio.to_thread(_update_job, job_id, stage=stage)
+
+    try:
+        req = ProvisionRequest(**request)
+        vm_maxmem = await asyncio.to_thread(proxmox_service.get_template_maxmem, req.os)
+        node = await _place_job(job_id, vm_maxmem)
+        result = await provision_worker.provision_worker(req, target_node=node, on_stage=report)
+        await asyncio.to_thread(_finish_job, job_id, "succeeded", result=result.model_dump())
+        print(f"Provision job {job_id} finished: VM {result.vmid} on {result.node}")
+    except HTTPException as e:
+        await asyncio.to_thread(_finish_job, job_id, "failed", error=str(e.detail))
+        print(f"Provision job {job_id} failed: {e.detail}")
+    except Exception as e:
+        await asyncio.to_thread(_finish_job, job_id, "failed", error=str(e))
+        print(f"Provision job {job_id} failed: {e}")
+
+
+async def _worker_loop(worker_no: int):
+    while True:
+        try:
+            claimed = await asyncio.to_thread(_claim_next_job)
+        except Exception as e:
+            print(f"Provision worker {worker_no} could not claim a job: {e}")
+            claimed = None
+
+        if claimed is None:
+            _job_available.clear()
+            try:
+                await asyncio.wait_for(_job_available.wait(), PROVISION_POLL_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+            continue
+
+        await _run_job(*claimed)
+
+
+def start_workers():
+    """Start the provisioning worker pool on the running event loop"""
+    global _job_available
+    _job_available = asyncio.Event()
+    for worker_no in range(PROVISION_WORKERS):
+        asyncio.create_task(_worker_loop(worker_no))
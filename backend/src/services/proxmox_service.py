@@ -1,15 +1,23 @@
 from proxmoxer import ProxmoxAPI
+from fastapi import HTTPException
 from src.util.env import get_required_env
 from src.util.ldap_sync_realm_httpx import sync_ldap_realm
 from src.models.enums import SupportedOS, OS_TEMPLATE_MAP
 from src.models.models import ProvisionRequest, ProvisionResponse
 import src.util.proxmox_util as proxmox_util
+from src.util.proxmox_client import proxmox_async
 import src.services.load_balance_service as load_balance_service
+import src.services.inventory_service as inventory_service
+import src.services.acl_service as acl_service
+import src.services.metrics_sampler as metrics_sampler
+import src.services.placement_service as placement_service
+import src.services.load_forecast_service as load_forecast_service
+import src.services.migration_cost as migration_cost
+from src.models.metrics import NodeMetrics
+import src.services.vmid_allocator as vmid_allocator
+import src.services.ip_service as ip_service
 import time
-from typing import Dict
-import requests
-
-session = requests.Session()
+import asyncio
 
 proxmox = ProxmoxAPI(
     get_required_env("PROXMOX_HOST"),
@@ -39,39 +47,22 @@ def list_realms():
     """List all authentication realms"""
     return proxmox.access.domains.get()
 
-def list_admin_vms():
+async def list_admin_vms():
     all_vms = []
-    for node in proxmox.nodes.get():
-        node_name = node["node"]
-        vms = proxmox.nodes(node_name).qemu.get()
-        for vm in vms:
-            all_vms.append({
-                "node": node_name,
-                "vmid": vm["vmid"],
-                "name": vm.get("name", ""),
-                "status": vm.get("status", "unknown")
-            })
+    for vm in sorted(await inventory_service.get_vms_async(), key=lambda vm: (vm["node"], vm["vmid"])):
+        all_vms.append({
+            "node": vm["node"],
+            "vmid": vm["vmid"],
+            "name": vm.get("name", ""),
+            "status": vm.get("status", "unknown")
+        })
     return all_vms
 
-def list_user_vms(username: str):
-    all_vms = list_admin_vms()
-    acl = proxmox.access.acl.get()
-
-    user_vmid_set = set()
-    for entry in acl:
-        if entry["type"] != "user":
-            continue
-        if not entry["path"].startswith("/vms/"):
-            continue
-
-        if entry["ugid"].split("@")[0].lower() == username.lower():
-            try:
-                vmid = int(entry["path"].split("/vms/")[1])
-                user_vmid_set.add(vmid)
-            except ValueError:
-                continue
-
-    return [vm for vm in all_vms if vm["vmid"] in user_vmid_set]
+async def list_user_vms(username: str):
+    user_vmid_set = await asyncio.to_thread(acl_service.get_user_vmids, username)
+    if not user_vmid_set:
+        return []
+    return [vm for vm in await list_admin_vms() if vm["vmid"] in user_vmid_set]
 
 def grant_vm_access(vmid: int, username: str):
     """Grant user access to a specific VM with PVEVMUser role"""
@@ -82,6 +73,7 @@ def grant_vm_access(vmid: int, username: str):
             roles=["PVEVMUser"],
             propagate=1
         )
+        acl_service.add_grant(username, vmid)
         return {"success": True, "vmid": vmid, "username": username, "role": "PVEVMUser"}
     except Exception as e:
         return {"success": False, "error": str(e)}
@@ -95,61 +87,77 @@ def revoke_vm_access(vmid: int, username: str):
             roles=["PVEVMUser"],
             delete=1
         )
+        acl_service.remove_grant(username, vmid)
         return {"success": True, "vmid": vmid, "username": username}
     except Exception as e:
         return {"success": False, "error": str(e)}
 
-def list_lxc():
+async def list_lxc():
     all_lxcs = []
-    for node in proxmox.nodes.get():
-        node_name = node["node"]
-        for lxc in proxmox.nodes(node_name).lxc.get():
-            all_lxcs.append({
-                "node": node_name,
-                "lxcid": lxc["vmid"],
-                "name": lxc.get("name", ""),
-                "status": lxc.get("status", "unknown")
-            })
+    for lxc in sorted(await inventory_service.get_lxcs_async(), key=lambda lxc: (lxc["node"], lxc["vmid"])):
+        all_lxcs.append({
+            "node": lxc["node"],
+            "lxcid": lxc["vmid"],
+            "name": lxc.get("name", ""),
+            "status": lxc.get("status", "unknown")
+        })
     return all_lxcs
 
 def start_vm(node, vmid):
-    return proxmox.nodes(node).qemu(vmid).status.start.post()
+    result = proxmox.nodes(node).qemu(vmid).status.start.post()
+    inventory_service.patch_guest(vmid, status="running")
+    ip_service.invalidate(vmid)
+    return result
 
 def stop_vm(node, vmid):
-    return proxmox.nodes(node).qemu(vmid).status.stop.post()
+    result = proxmox.nodes(node).qemu(vmid).status.stop.post()
+    inventory_service.patch_guest(vmid, status="stopped")
+    ip_service.invalidate(vmid)
+    return result
 
 def reboot_vm(node, vmid):
-    return proxmox.nodes(node).qemu(vmid).status.reboot.post()
+    result = proxmox.nodes(node).qemu(vmid).status.reboot.post()
+    ip_service.invalidate(vmid)
+    return result
 
 def delete_vm(node, vmid, purge: bool = True):
-    return proxmox.nodes(node).qemu(vmid).delete(purge=int(purge))
+    result = proxmox.nodes(node).qemu(vmid).delete(purge=int(purge))
+    inventory_service.remove_guest(vmid)
+    ip_service.invalidate(vmid)
+    acl_service.forget_vm(vmid)
+    return result
 
 def start_lxc(node, containerid):
-    return proxmox.nodes(node).lxc(containerid).status.start.post()
+    result = proxmox.nodes(node).lxc(containerid).status.start.post()
+    inventory_service.patch_guest(containerid, status="running")
+    ip_service.invalidate(containerid)
+    return result
 
 def stop_lxc(node, containerid):
-    return proxmox.nodes(node).lxc(containerid).status.stop.post()
+    result = proxmox.nodes(node).lxc(containerid).status.stop.post()
+    inventory_service.patch_guest(containerid, status="stopped")
+    ip_service.invalidate(containerid)
+    return result
 
 def reboot_lxc(node, containerid):
-    return proxmox.nodes(node).lxc(containerid).status.reboot.post()
+    result = proxmox.nodes(node).lxc(containerid).status.reboot.post()
+    ip_service.invalidate(containerid)
+    return result
 
 def delete_lxc(node, containerid, purge: bool = True):
-    return proxmox.nodes(node).lxc(containerid).delete(purge=int(purge))
+    result = proxmox.nodes(node).lxc(containerid).delete(purge=int(purge))
+    inventory_service.remove_guest(containerid)
+    ip_service.invalidate(containerid)
+    return result
 
 def get_vmid_and_node_by_name(name: str) -> tuple[int, str] | None:
-    for vm in proxmox.cluster.resources.get(type="vm"):
-        if vm.get("name") == name:
-            return int(vm["vmid"]), vm["node"]
-    return None
+    return inventory_service.find_by_name(name)
 
 def get_node_by_vmid(vmid: int) -> str | None:
     """
     Return the node where a VM with the given VMID is located.
     """
-    for vm in proxmox.cluster.resources.get(type="vm"):
-        if str(vm["vmid"]) == str(vmid):
-            return vm["node"]
-    return None
+    return inventory_service.find_node(vmid)
 
 # Proxmox users
 
@@ -179,43 +187,16 @@ def get_user_groups(userid: str):
 
     return {"status": "success", "userid": userid, "groups": user_groups}
 
-# IP
-
-def get_lxc_ip(node, containerid):
-    status = proxmox.nodes(node).lxc(containerid).status.current.get()
-    network_info = status.get('data', {}).get('network', {})
-    for iface_name, iface_data in network_info.items():
-        ip = iface_data.get('ip')
-        ip6 = iface_data.get('ip6')
-        if ip:
-            return ip
-        if ip6:
-            return ip6
-    return None
-
-def get_vm_ip(node_name, vmid):
-    try:
-        agent_info = proxmox.nodes(node_name).qemu(vmid).agent('network-get-interfaces').get()
-        for iface in agent_info['result']:
-            for ip in iface.get('ip-addresses', []):
-                # Skip loopback (127.x.x.x or ::1)
-                if ip['ip-address'].startswith('127.') or ip['ip-address'] == '::1':
-                    continue
-                return ip['ip-address']  # Accept 10.51.x.x and others
-    except Exception  as e:
-        if "QEMU agent is not running" in str(e):
-            return "QEMU agent not running"
-        return f"Error retrieving IP '{str(e)}'"
-
 # Proxmox Node Performance and Report
 
 def get_node_report(node):
     return proxmox.nodes(node).report.get()
 
 def get_node_performance(node: str):
+    return format_node_performance(inventory_service.get_node_status(node))
 
-    status = proxmox.nodes(node).status.get()
-
+def format_node_performance(status: dict) -> dict:
+    """Turn a /nodes/{node}/status response into the node performance summary"""
     cpu_usage = round(status.get("cpu", 0.0) * 100, 2)
     load_avg = status.get("loadavg", [])
 
@@ -246,58 +227,62 @@ def get_node_performance_full (node: str):
     status = proxmox.nodes(node).status.get()
     return status
 
-def get_disk_health(node: str):
-    disk_list = proxmox.nodes(node).disks.list.get()
-    results = []
-
-    for disk in disk_list:
-        dev = disk.get("devpath")
-        if not dev:
-            continue
+async def get_disk_health(node: str):
+    disk_list = await proxmox_async.get(f"/nodes/{node}/disks/list")
 
+    async def disk_health(dev: str):
         try:
-            smart_info = proxmox.nodes(node).disks.smart.get(disk=dev)
+            smart_info = await proxmox_async.get(f"/nodes/{node}/disks/smart", disk=dev)
             parsed = proxmox_util.parse_smart_attributes(smart_info)
             parsed["Device"] = dev
-            results.append(parsed)
+            return parsed
         except Exception as e:
-            results.append({"Device": dev, "Error": str(e)})
+            return {"Device": dev, "Error": str(e)}
 
-    return results
+    devices = [disk["devpath"] for disk in disk_list if disk.get("devpath")]
+    return list(await asyncio.gather(*(disk_health(dev) for dev in devices)))
 
 # Proxmox VM Provisioning Service
 
-def get_next_vmid() -> int:
-    existing_vms = proxmox.cluster.resources.get(type="vm")
-    existing_ids = [vm["vmid"] for vm in existing_vms if "vmid" in vm]
-    return max(existing_ids, default=100) + 1  # start from 101 if none exist
+def get_next_vmid(owner: str | None = None) -> int:
+    """Reserve a free VMID; release it with vmid_allocator.release() if the VM is never created"""
+    return vmid_allocator.reserve(owner)
+
+async def pick_best_node(exclude: set[str] | None = None, vm_maxmem: int = 0):
+    """Best node for a new VM with vm_maxmem bytes of memory, or None if no node can take it"""
+    metrics = await metrics_sampler.get_metrics_view_async("ewma") or await get_all_node_metrics()
+    forecast = load_forecast_service.forecast_all(metrics)
+    return placement_service.choose_node(metrics, exclude=exclude, forecast=forecast, vm_maxmem=vm_maxmem)
 
-def pick_best_node():
-    def score(m: Dict[str, float]) -> float:
-        return (m["cpu"] * 4) + (m["mem"] * 3) + (m["disk"] * 2) + m["io_delay"]
-    metrics = get_all_node_metrics()
-    best = min(metrics.items(), key=lambda kv: score(kv[1]))[0]
-    return best
+def get_template_maxmem(os: SupportedOS) -> int:
+    """Memory a VM cloned from the OS template will be configured with"""
+    template = inventory_service.get_guest(OS_TEMPLATE_MAP[os])
+    return template.get("maxmem", 0) if template else 0
 
-def provision_cloud_init_vm(username: str, password: str, OS: SupportedOS, ssh_key: str = None, vm_name: str = None):
+async def provision_cloud_init_vm(username: str, password: str, OS: SupportedOS, ssh_key: str = None, vm_name: str = None):
     vmid = get_next_vmid()
     try:
-        node = pick_best_node()
+        node = await pick_best_node()
         if not node:
             return {"error": "No suitable node found for provisioning."}
     except Exception as e:
         return {"error": f"Error selecting node: {str(e)}"}
 
-def provision_cloud_init_vm_with_retry(node: str, vmid: int, req: ProvisionRequest, retries: int = 5, delay: float = 2.0):
+def provision_cloud_init_vm_with_retry(node: str, vmid: int, req: ProvisionRequest, retries: int = 5, delay: float = 2.0, name: str | None = None):
+    # Renaming (and dropping pool tags) is only needed for VMs taken from the warm pool
+    rename = {"name": name, "delete": "tags"} if name else {}
     for attempt in range(retries):
         try:
-            proxmox.nodes(node).qemu(vmid).config.post(
+            upid = proxmox.nodes(node).qemu(vmid).config.post(
                 ciuser=req.username,
                 cipassword=req.password,
                 sshkeys=req.ssh_key,
                 ipconfig0="ip=dhcp",
+                **rename,
             )
-            return {"success": True}
+            if name:
+                inventory_service.patch_guest(vmid, name=name, tags="")
+            return {"success": True, "upid": upid}
         except Exception as e:
             message = str(e)
             if "lock" in message.lower() and attempt < retries - 1:
@@ -320,20 +305,73 @@ def wait_for_first_ip(node: str, vmid: int, timeout: int = 120) -> str | None: #
         time.sleep(3)
     return None
 
-async def clone_vm(source_node: str, source_vmid: int, target_vmid: int, vm_name: str):
+def get_shared_storages() -> set[str]:
+    return {
+        res["storage"] for res in inventory_service.get_resources("storage")
+        if res.get("shared") and "storage" in res
+    }
+
+def uses_only_shared_storage(node: str, vmid: int) -> bool:
+    disks = proxmox_util.parse_vm_disks(proxmox.nodes(node).qemu(vmid).config.get())
+    shared = get_shared_storages()
+    return all(disk["storage"] in shared for disk in disks)
+
+def resolve_clone_source(template_vmid: int, target_node: str) -> tuple[int, str, str]:
+    """
+    Decide how to clone a template so the VM lands on target_node.
+    Returns (source_vmid, source_node, clone_node). clone_node differs from target_node
+    only when the clone has to be migrated afterwards.
+    """
+    template = inventory_service.get_guest(template_vmid)
+    if not template:
+        raise HTTPException(404, detail=f"Template VM {template_vmid} not found")
+    template_node = template["node"]
+    if template_node == target_node:
+        return template_vmid, template_node, target_node
+
+    # A replica of the template (same name, also a template) already present on the target node
+    for vm in inventory_service.get_vms():
+        if vm["node"] == target_node and vm.get("template") and vm.get("name") == template.get("name"):
+            return int(vm["vmid"]), target_node, target_node
+
+    if uses_only_shared_storage(template_node, template_vmid):
+        return template_vmid, template_node, target_node
+
+    return template_vmid, template_node, template_node
+
+async def clone_vm(source_node: str, source_vmid: int, target_vmid: int, vm_name: str, target_node: str | None = None, full: bool = True):
     try:
         result = proxmox.nodes(source_node).qemu(source_vmid).clone.post(
             newid=target_vmid,
             name=vm_name,
-            full=1,
-            target=source_node,
+            full=int(full),
+            target=target_node or source_node,
         )
         upid = result["data"] if isinstance(result, dict) else result
+        inventory_service.invalidate()
         return {"success": True, "upid": upid}
 
     except Exception as e:
         return {"error": f"Failed to clone VM: {str(e)}"}
 
+async def discard_vm(vmid: int):
+    """Stop and delete a VM left behind by a failed provisioning run, then free its VMID"""
+    node = await asyncio.to_thread(get_node_by_vmid, vmid)
+    if node:
+        try:
+            upid = await asyncio.to_thread(stop_vm, node, vmid)
+            await proxmox_util.wait_for_task_completion(upid, timeout=120)
+        except Exception:
+            pass  # never started
+        try:
+            upid = await asyncio.to_thread(delete_vm, node, vmid)
+            await proxmox_util.wait_for_task_completion(upid, timeout=300)
+        except Exception as e:
+            print(f"Removing VM {vmid} after failed provisioning failed: {e}")
+            return
+    await asyncio.to_thread(vmid_allocator.release, vmid)
+    print(f"Removed VM {vmid} after failed provisioning")
+
 def cloud_init_vm(node: str, vmid: int, req: ProvisionRequest):
     try:
         return proxmox.nodes(node).qemu(vmid).config.post(
@@ -346,25 +384,37 @@ def cloud_init_vm(node: str, vmid: int, req: ProvisionRequest):
         return {"error": f"Failed to configure cloud-init: {str(e)}"}
 
 # Load Balancer: Raw node metrics for load decisions
-def get_all_node_metrics():
+async def get_all_node_metrics():
+    nodes = [
+        node for node in await inventory_service.get_nodes_async()
+        if node.get("status") == "online" and node.get("maxmem")
+    ]
+    statuses = await asyncio.gather(
+        *(inventory_service.get_node_status_async(node["node"]) for node in nodes)
+    )
+    committed = inventory_service.get_committed_memory()
     metrics = {}
-    for node in proxmox.nodes.get():
-        node_name = node['node']
-        status = proxmox.nodes(node_name).status.get()
-        metrics[node_name] = {
-            "CPU": status["cpu"] * 100,
-            "Memory": (status["memory"]["used"] / status["memory"]["total"]) * 100,
-            "IO_Delay": status["wait"] * 100
-        }
+    for node, status in zip(nodes, statuses):
+        metrics[node["node"]] = NodeMetrics(
+            node=node["node"],
+            cpu=node["cpu"] * 100,
+            memory=(node["mem"] / node["maxmem"]) * 100,
+            io_delay=status["wait"] * 100,
+            disk=(node["disk"] / node["maxdisk"]) * 100 if node.get("maxdisk") else 0.0,
+            mem_committed=committed.get(node["node"], 0),
+            mem_total=node["maxmem"],
+        )
     return metrics
 def get_running_vms_by_node(node): #NO endpoint, used internally
     return [
-        vm for vm in proxmox.nodes(node).qemu.get()
-        if vm.get("status") == "running" and "vmid" in vm
+        vm for vm in inventory_service.get_vms()
+        if vm["node"] == node and vm.get("status") == "running"
     ]
 
-def migrate_vm(vmid: int, source_node: str, target_node: str): #NO endpoint, used internally
+def migrate_vm(vmid: int, source_node: str, target_node: str, online: bool = True, with_local_disks: bool | None = None): #NO endpoint, used internally
     try:
+        if with_local_disks is None:
+            with_local_disks = not uses_only_shared_storage(source_node, vmid)
         result = proxmox_util.migrate_vm_httpx(
             host=get_required_env("PROXMOX_HOST_NAME"),
             source_node=source_node,
@@ -372,18 +422,31 @@ def migrate_vm(vmid: int, source_node: str, target_node: str): #NO endpoint, use
             target_node=target_node,
             username=get_required_env("PROXMOX_USERNAME"),
             password=get_required_env("PROXMOX_PASSWORD"),
-            with_local_disks=True,
-            online=True,
+            with_local_disks=with_local_disks,
+            online=online,
             verify_ssl=False
         )
+        inventory_service.invalidate()
+        ip_service.invalidate(vmid)
         return result
     except Exception as e:
         return {"error": str(e)}
 
-def manual_load_balance():
+async def get_migration_estimate(vmid: int):
+    return await migration_cost.estimate(vmid)
+
+async def get_load_balance_plan():
     try:
-        load_balance_service.rebalance()
+        return await load_balance_service.get_plan()
+    except Exception as e:
+        return {"error": str(e)}
+
+async def manual_load_balance():
+    try:
+        await load_balance_service.rebalance()
         return {"status": "success", "message": "Load balancing completed."}
+    except HTTPException:
+        raise
     except Exception as e:
         return {"status": "error", "message": str(e)}
 
@@ -401,10 +464,3 @@ def get_vm_console_url(vm_name: str):
     f"ticket={ticket}"
     )
     return novnc_url
-
-def get_access_cookie() -> str:
-    cookie = session.cookies.get("PVEAuthCookie")
-    if cookie:
-        return cookie
-    if not cookie:
-        return {"error": "No PVEAuthCookie found in session cookies."}
@@ -0,0 +1,155 @@
+from src.models.metrics import NodeMetrics
+import src.services.inventory_service as inventory_service
+import src.services.placement_service as placement_service
+
+MAX_PLAN_MOVES = 5  # moves proposed per planning round
+MIN_MOVE_BYTES = 256 * 1024 ** 2  # floor on migration cost so tiny VMs do not look free
+MAX_LOCAL_DISK_MOVES = 1  # moves per plan that have to copy local disks
+
+
+def _imbalance(metrics: dict[str, NodeMetrics]) -> float:
+    """Sum of squared deviations of each node's CPU, memory and committed memory from the cluster mean"""
+    if not metrics:
+        return 0.0
+    total = 0.0
+    for values in (
+        [m.cpu for m in metrics.values()],
+        [m.memory for m in metrics.values()],
+        [m.committed for m in metrics.values()],
+    ):
+        mean = sum(values) / len(values)
+        total += sum((value - mean) ** 2 for value in values)
+    return total
+
+
+def _vm_load(vm: dict) -> tuple[float, int]:
+    """Return (cores in use, bytes of memory in use) for a guest from the resources snapshot"""
+    return vm.get("cpu", 0.0) * vm.get("maxcpu", 1), vm.get("mem", 0)
+
+
+def _project(metrics: dict[str, NodeMetrics], capacity: dict[str, dict], vm: dict, source: str, target: str) -> dict[str, NodeMetrics]:
+    """Node metrics after moving vm from source to target; IO delay and disk are left as is"""
+    cores, mem = _vm_load(vm)
+    projected = dict(metrics)
+    for node, sign in ((source, -1), (target, 1)):
+        m = projected[node]
+        projected[node] = m.with_load(
+            cpu=m.cpu + sign * cores / capacity[node]["maxcpu"] * 100,
+            memory=m.memory + sign * mem / capacity[node]["maxmem"] * 100,
+            mem_committed=m.mem_committed + sign * vm.get("maxmem", 0),
+        )
+    return projected
+
+
+def apply_moves(metrics: dict[str, NodeMetrics], moves: list[dict]) -> dict[str, NodeMetrics]:
+    """Shift completed moves' load in a metrics view, since the sampled averages lag behind a migration"""
+    capacity = {node["node"]: node for node in inventory_service.get_nodes() if node.get("maxcpu") and node.get("maxmem")}
+    adjusted = dict(metrics)
+    for move in moves:
+        if not all(node in adjusted and node in capacity for node in (move["source"], move["target"])):
+            continue
+        vm = {"cpu": move["cpu_cores"], "maxcpu": 1, "mem": move["mem_bytes"], "maxmem": move["maxmem_bytes"]}
+        adjusted = _project(adjusted, capacity, vm, move["source"], move["target"])
+    return adjusted
+
+
+def migration_bytes(vm: dict, cost: dict | None = None) -> int:
+    """Bytes migrating the guest has to copy: the cost estimate if there is one, else its RAM"""
+    moved = cost["transfer_bytes"] if cost else vm.get("mem", 0)
+    return max(moved, MIN_MOVE_BYTES)
+
+
+def build_plan(
+    metrics: dict[str, NodeMetrics],
+    sustained: dict[str, NodeMetrics] | None = None,
+    exclude_vmids: set[int] | None = None,
+    max_moves: int = MAX_PLAN_MOVES,
+    costs: dict[int, dict] | None = None,
+    allow_local_disks: bool = True,
+) -> dict:
+    """
+    Greedily pick migrations off overloaded nodes, each time taking the move with the largest
+    drop in imbalance per byte migrated that keeps the target under the thresholds.
+    metrics is the per-node view used for projections; sustained (optional) decides which nodes are overloaded.
+    costs are migration_cost estimates by VMID. VMs that must copy local disks are skipped unless
+    allow_local_disks, and at most MAX_LOCAL_DISK_MOVES of them are planned.
+    """
+    costs = costs or {}
+    deferred = set()
+    capacity = {
+        node["node"]: node for node in inventory_service.get_nodes()
+        if node["node"] in metrics and node.get("maxcpu") and node.get("maxmem")
+    }
+    current = {node: m for node, m in metrics.items() if node in capacity}
+    overloaded_by_trend = {
+        node for node in current
+        if placement_service.is_overloaded((sustained or {}).get(node, current[node]))
+    }
+    guests = [
+        vm for vm in inventory_service.get_vms()
+        if vm.get("status") == "running" and not vm.get("template") and vm.get("node") in current
+        and int(vm["vmid"]) not in (exclude_vmids or set())
+    ]
+
+    before = current
+    moves = []
+    moved = set()
+    imbalance = _imbalance(current)
+    start_imbalance = imbalance
+    while len(moves) < max_moves:
+        sources = [node for node in overloaded_by_trend if placement_service.is_overloaded(current[node])]
+        best = None
+        local_moves = sum(1 for move in moves if move["with_local_disks"])
+        for vm in guests:
+            if vm["vmid"] in moved or vm["node"] not in sources:
+                continue
+            cost = costs.get(int(vm["vmid"]))
+            if cost and cost["with_local_disks"] and (not allow_local_disks or local_moves >= MAX_LOCAL_DISK_MOVES):
+                deferred.add(int(vm["vmid"]))
+                continue
+            for target in current:
+                if target == vm["node"]:
+                    continue
+                projected = _project(current, capacity, vm, vm["node"], target)
+                if placement_service.violations(projected[target]):
+                    continue
+                gain = imbalance - _imbalance(projected)
+                if gain <= 0:
+                    continue
+                score = gain / (migration_bytes(vm, cost) / 1024 ** 3)
+                if best is None or score > best[0]:
+                    best = (score, vm, target, projected, cost)
+        if best is None:
+            break
+
+        score, vm, target, projected, cost = best
+        new_imbalance = _imbalance(projected)
+        moves.append({
+            "vmid": int(vm["vmid"]),
+            "name": vm.get("name"),
+            "source": vm["node"],
+            "target": target,
+            "cpu_cores": round(_vm_load(vm)[0], 2),
+            "mem_bytes": vm.get("mem", 0),
+            "maxmem_bytes": vm.get("maxmem", 0),
+            "migration_bytes": migration_bytes(vm, cost),
+            # Without an estimate, fall back to the old behaviour of always moving local disks
+            "with_local_disks": cost["with_local_disks"] if cost else True,
+            "online": cost["online"] if cost else True,
+            "local_disk_bytes": cost["local_disk_bytes"] if cost else None,
+            "estimated_seconds": cost["estimated_seconds"] if cost else None,
+            "score": round(score, 4),
+            "imbalance_before": round(imbalance, 2),
+            "imbalance_after": round(new_imbalance, 2),
+        })
+        moved.add(vm["vmid"])
+        current, imbalance = projected, new_imbalance
+
+    return {
+        "moves": moves,
+        "deferred_local_disk_vmids": sorted(deferred - moved),
+        "imbalance_before": round(start_imbalance, 2),
+        "imbalance_after": round(imbalance, 2),
+        "before": {node: m.to_dict() for node, m in before.items()},
+        "after": {node: m.to_dict() for node, m in current.items()},
+    }
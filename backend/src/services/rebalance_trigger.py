@@ -0,0 +1,72 @@
+import asyncio
+import time
+import src.services.metrics_sampler as metrics_sampler
+import src.services.placement_service as placement_service
+import src.services.load_balance_service as load_balance_service
+
+REBALANCE_FALLBACK_INTERVAL = 900  # seconds; rebalance at least this often even without a trigger
+REBALANCE_HYSTERESIS = 10  # percentage points a hot node must drop below the thresholds to re-arm
+REBALANCE_NODE_COOLDOWN = 600  # seconds before the same node can trigger again
+
+_hot: set[str] = set()  # nodes that triggered and have not cooled down below the hysteresis band
+_last_trigger: dict[str, float] = {}  # node -> time.monotonic() of its last trigger
+_pending: set[str] = set()
+_triggered = asyncio.Event()
+
+
+def _cooled_down(m) -> bool:
+    """
+    Whether the node is under every load threshold by at least REBALANCE_HYSTERESIS. These are
+    the constraints the trigger fires on (placement_service.load_violations), so a node cannot
+    re-arm while it is still over one of them.
+    """
+    margin = REBALANCE_HYSTERESIS
+    return (
+        m.cpu + margin <= placement_service.CPU_THRESHOLD
+        and m.memory + margin <= placement_service.MEM_THRESHOLD
+        and m.io_delay + margin <= placement_service.IO_DELAY_THRESHOLD
+        and m.committed + margin <= placement_service.OVERCOMMIT_RATIO * 100
+    )
+
+
+def check():
+    """
+    Look at the latest samples and wake the rebalancer when a node newly sustains overload.
+    Registered as a metrics_sampler listener, so it runs after every sampling round.
+    """
+    sustained = load_balance_service.sustained_view()
+    current = metrics_sampler.get_metrics_view("ewma")
+    now = time.monotonic()
+
+    for node in list(_hot):
+        if node in current and _cooled_down(current[node]):
+            _hot.discard(node)
+
+    for node, m in sustained.items():
+        broken = placement_service.load_violations(m)
+        if node in _hot or not broken:
+            continue
+        if now - _last_trigger.get(node, float("-inf")) < REBALANCE_NODE_COOLDOWN:
+            continue  # checked again after every round, so it fires once the cooldown ends
+        _hot.add(node)
+        _last_trigger[node] = now
+        _pending.add(node)
+        print(f"[trigger] {node} sustained overload ({', '.join(broken)})")
+        _triggered.set()
+
+
+async def wait_for_trigger(timeout: float = REBALANCE_FALLBACK_INTERVAL) -> list[str]:
+    """Wait until a node triggers or the fallback interval passes; return the triggering nodes (empty on timeout)"""
+    try:
+        await asyncio.wait_for(_triggered.wait(), timeout)
+    except asyncio.TimeoutError:
+        pass
+    _triggered.clear()
+    nodes = sorted(_pending)
+    _pending.clear()
+    return nodes
+
+
+def start():
+    """Evaluate the trigger after every metrics sampling round"""
+    metrics_sampler.add_listener(check)
@@ -0,0 +1,74 @@
+import threading
+from collections import deque
+from datetime import timedelta
+from sqlalchemy import select, func, delete
+from sqlalchemy.dialects.postgresql import insert
+from src.util.database import SessionLocal
+from src.util.env import get_int_env
+from src.util.proxmox_util import proxmox
+from src.models.db_models import VMIDReservation, utcnow
+import src.services.inventory_service as inventory_service
+
+VMID_RESERVATION_TTL = timedelta(minutes=30)  # long enough for the clone to show up in the inventory
+VMID_BLOCK_SIZE = get_int_env("VMID_BLOCK_SIZE", 20)  # candidate IDs fetched per /cluster/nextid call
+VMID_MAX = 999_999_999
+
+_block: deque[int] = deque()
+_block_end = 0
+_block_lock = threading.Lock()
+
+
+def _refill_block():
+    """Queue the next VMID_BLOCK_SIZE candidates, starting past anything reserved or handed out"""
+    global _block_end
+    next_free = int(proxmox.cluster.nextid.get())
+    with SessionLocal() as db:
+        max_reserved = db.scalar(
+            select(func.max(VMIDReservation.vmid)).where(VMIDReservation.expires_at > utcnow())
+        ) or 0
+    start = max(next_free, max_reserved + 1, _block_end)
+    _block_end = min(start + VMID_BLOCK_SIZE, VMID_MAX + 1)
+    if start >= _block_end:
+        raise RuntimeError("No free VMIDs left")
+    _block.extend(range(start, _block_end))
+
+
+def _next_candidate() -> int:
+    with _block_lock:
+        if not _block:
+            _refill_block()
+        return _block.popleft()
+
+
+def _try_reserve(vmid: int, owner: str | None) -> bool:
+    with SessionLocal() as db:
+        db.execute(delete(VMIDReservation).where(VMIDReservation.expires_at <= utcnow()))
+        inserted = db.execute(
+            insert(VMIDReservation)
+            .values(vmid=vmid, owner=owner, reserved_at=utcnow(), expires_at=utcnow() + VMID_RESERVATION_TTL)
+            .on_conflict_do_nothing(index_elements=["vmid"])
+            .returning(VMIDReservation.vmid)
+        ).scalar_one_or_none()
+        db.commit()
+        return inserted is not None
+
+
+def reserve(owner: str | None = None) -> int:
+    """
+    Reserve a VMID that no other request (in any process) will be handed until the reservation expires.
+    Candidates come from a locally pre-fetched block and are reconciled against the inventory.
+    """
+    existing = set(inventory_service.get_all_vmids())
+    while True:
+        vmid = _next_candidate()
+        if vmid in existing:
+            continue
+        if _try_reserve(vmid, owner):
+            return vmid
+
+
+def release(vmid: int):
+    """Give up a reservation whose VM was never created"""
+    with SessionLocal() as db:
+        db.execute(delete(VMIDReservation).where(VMIDReservation.vmid == vmid))
+        db.commit()
@@ -0,0 +1,183 @@
+import asyncio
+from datetime import timedelta
+from sqlalchemy import select, func, text, delete, update, case
+from src.util.database import SessionLocal
+from src.util.env import get_int_env
+from src.util.schedule import is_off_peak
+from src.models.db_models import WarmPoolVM, utcnow
+from src.models.enums import SupportedOS, OS_TEMPLATE_MAP
+import src.util.proxmox_util as proxmox_util
+import src.services.proxmox_service as proxmox_service
+import src.services.inventory_service as inventory_service
+import src.services.vmid_allocator as vmid_allocator
+
+WARM_POOL_SIZE = get_int_env("WARM_POOL_SIZE", 2)  # stopped, pre-cloned VMs kept per OS
+WARM_POOL_REFILL_INTERVAL = 300  # seconds between refill checks
+WARM_POOL_PREPARE_TIMEOUT = timedelta(hours=1)  # forget "preparing" rows older than this
+WARM_POOL_TAG = "warm-pool"
+
+# Advisory lock serialising pool slot reservations across processes
+_POOL_LOCK_KEY = 7_301_002
+
+
+def _pool_vm_name(os: SupportedOS, vmid: int) -> str:
+    return f"pool-{os.value.lower()}-{vmid}"
+
+
+def _reserve_slot(os: SupportedOS, vmid: int) -> bool:
+    """Record a VM we are about to clone, unless the pool for this OS is already full"""
+    with SessionLocal() as db:
+        db.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": _POOL_LOCK_KEY})
+        size = db.scalar(select(func.count()).select_from(WarmPoolVM).where(WarmPoolVM.os == os.value))
+        if size >= WARM_POOL_SIZE or db.get(WarmPoolVM, vmid) is not None:
+            db.commit()
+            return False
+        db.add(WarmPoolVM(vmid=vmid, os=os.value, state="preparing"))
+        db.commit()
+        return True
+
+
+def _mark_ready(vmid: int, node: str):
+    with SessionLocal() as db:
+        db.execute(update(WarmPoolVM).where(WarmPoolVM.vmid == vmid).values(state="ready", node=node, updated_at=utcnow()))
+        db.commit()
+
+
+def _drop(vmid: int):
+    with SessionLocal() as db:
+        db.execute(delete(WarmPoolVM).where(WarmPoolVM.vmid == vmid))
+        db.commit()
+
+
+def _take_ready(os: SupportedOS, node: str | None = None) -> int | None:
+    """Remove and return one ready pool VM for the OS, preferring one parked on node"""
+    with SessionLocal() as db:
+        row = db.execute(
+            select(WarmPoolVM)
+            .where(WarmPoolVM.os == os.value, WarmPoolVM.state == "ready")
+            .order_by(case((WarmPoolVM.node == node, 0), else_=1), WarmPoolVM.created_at)
+            .limit(1)
+            .with_for_update(skip_locked=True)
+        ).scalar_one_or_none()
+        if row is None:
+            db.commit()
+            return None
+        vmid = row.vmid
+        db.delete(row)
+        db.commit()
+        return vmid
+
+
+def _prune():
+    """Drop rows whose VM vanished from the cluster or whose preparation never finished"""
+    known = set(inventory_service.get_all_vmids())
+    with SessionLocal() as db:
+        rows = db.execute(select(WarmPoolVM)).scalars().all()
+        for row in rows:
+            abandoned = row.state == "preparing" and row.updated_at < utcnow() - WARM_POOL_PREPARE_TIMEOUT
+            if abandoned or (row.state == "ready" and row.vmid not in known):
+                db.delete(row)
+        db.commit()
+
+
+def get_pool_status() -> dict:
+    """Return the number of ready and preparing VMs per OS"""
+    status = {os.value: {"ready": 0, "preparing": 0} for os in SupportedOS}
+    with SessionLocal() as db:
+        rows = db.execute(select(WarmPoolVM.os, WarmPoolVM.state, func.count()).group_by(WarmPoolVM.os, WarmPoolVM.state))
+        for os, state, count in rows:
+            status.setdefault(os, {"ready": 0, "preparing": 0})[state] = count
+    return status
+
+
+async def claim(os: SupportedOS, node: str | None = None) -> tuple[int, str] | None:
+    """
+    Take a ready pool VM for the OS, preferring one already on node; return (vmid, node)
+    or None when the pool is empty
+    """
+    while True:
+        vmid = await asyncio.to_thread(_take_ready, os, node)
+        if vmid is None:
+            return None
+        node = await asyncio.to_thread(proxmox_service.get_node_by_vmid, vmid)
+        if node:
+            return vmid, node
+        print(f"Warm pool VM {vmid} no longer exists, skipping it")
+
+
+async def _prepare_vm(os: SupportedOS) -> bool:
+    """Clone one pool VM for the OS and park it, stopped, on the node with the most headroom"""
+    template_vmid = OS_TEMPLATE_MAP[os]
+    template_node = await asyncio.to_thread(proxmox_service.get_node_by_vmid, template_vmid)
+    if not template_node:
+        print(f"Warm pool: template {template_vmid} for {os.value} not found")
+        return False
+
+    vmid = await asyncio.to_thread(proxmox_service.get_next_vmid, WARM_POOL_TAG)
+    if not await asyncio.to_thread(_reserve_slot, os, vmid):
+        await asyncio.to_thread(vmid_allocator.release, vmid)
+        return False
+
+    cloned = False
+    try:
+        vm_maxmem = await asyncio.to_thread(proxmox_service.get_template_maxmem, os)
+        target_node = await proxmox_service.pick_best_node(vm_maxmem=vm_maxmem)
+        if not target_node:
+            raise RuntimeError("no node has enough free capacity")
+        source_vmid, clone_from_node, clone_node = await asyncio.to_thread(
+            proxmox_service.resolve_clone_source, template_vmid, target_node
+        )
+        clone_result = await proxmox_service.clone_vm(
+            clone_from_node, source_vmid, vmid, _pool_vm_name(os, vmid), target_node=clone_node
+        )
+        if "error" in clone_result:
+            raise RuntimeError(clone_result["error"])
+        cloned = True
+        await proxmox_util.wait_for_task_completion(clone_result["upid"], timeout=900)
+        await asyncio.to_thread(
+            lambda: proxmox_util.proxmox.nodes(clone_node).qemu(vmid).config.put(tags=WARM_POOL_TAG)
+        )
+
+        if target_node != clone_node:
+            migrate_result = await asyncio.to_thread(
+                proxmox_service.migrate_vm, vmid, clone_node, target_node, False
+            )
+            if "error" in migrate_result:
+                raise RuntimeError(migrate_result["error"])
+            await proxmox_util.wait_for_task_completion(migrate_result["data"], timeout=1800)
+
+        await asyncio.to_thread(_mark_ready, vmid, target_node)
+        print(f"Warm pool: VM {vmid} ({os.value}) ready on {target_node}")
+        return True
+    except Exception as e:
+        print(f"Warm pool: preparing VM {vmid} ({os.value}) failed: {e}")
+        # Remove a half-prepared clone so it does not leak on the cluster
+        if cloned:
+            await proxmox_service.discard_vm(vmid)
+        else:
+            await asyncio.to_thread(vmid_allocator.release, vmid)
+        await asyncio.to_thread(_drop, vmid)
+        return False
+
+
+async def refill():
+    """Top every OS pool up to WARM_POOL_SIZE"""
+    await asyncio.to_thread(_prune)
+    status = await asyncio.to_thread(get_pool_status)
+    for os in SupportedOS:
+        counts = status.get(os.value, {})
+        missing = WARM_POOL_SIZE - counts.get("ready", 0) - counts.get("preparing", 0)
+        for _ in range(max(missing, 0)):
+            if not await _prepare_vm(os):
+                break
+
+
+async def start_refill_loop():
+    """Refill the warm pool in the background during off-peak hours"""
+    while True:
+        if WARM_POOL_SIZE > 0 and is_off_peak():
+            try:
+                await refill()
+            except Exception as e:
+                print(f"Warm pool refill failed: {e}")
+        await asyncio.sleep(WARM_POOL_REFILL_INTERVAL)
@@ -0,0 +1,164 @@
+import json
+import re
+from urllib.parse import parse_qs
+import httpx
+
+# Live migration throughput assumed by the fake cluster when accounting migration time
+SIM_MIGRATION_BANDWIDTH = 1024 ** 3 // 8  # bytes per second (~1 Gbit/s)
+SHARED_STORAGE = "ceph"
+LOCAL_STORAGE = "local-lvm"
+
+
+class FakeProxmox:
+    """
+    In-memory stand-in for the Proxmox API, served through an httpx.MockTransport.
+    Implements just the endpoints the rebalance path uses: cluster resources, node status,
+    rrddata, ticket login, qemu config and migration, and task status. Migrations complete instantly;
+    their duration is accounted in virtual time instead.
+    """
+
+    def __init__(self, nodes: dict[str, dict], vms: list[dict], clock):
+        self.clock = clock
+        self.nodes = {
+            name: {
+                "maxcpu": spec["maxcpu"],
+                "maxmem": spec["maxmem"],
+                "maxdisk": spec.get("maxdisk", 100 * 1024 ** 3),
+                "disk": spec.get("disk", 0),
+                "base_cpu": spec.get("base_cpu", 0.0),  # cores used by the host itself
+                "base_mem": spec.get("base_mem", 0),
+                "iowait": 0.0,
+            }
+            for name, spec in nodes.items()
+        }
+        self.vms = {
+            int(vm["vmid"]): {
+                "vmid": int(vm["vmid"]),
+                "name": vm.get("name", f"vm-{vm['vmid']}"),
+                "node": vm["node"],
+                "maxcpu": vm["maxcpu"],
+                "maxmem": vm["maxmem"],
+                "maxdisk": vm.get("maxdisk", 0),
+                "storage": vm.get("storage", LOCAL_STORAGE),
+                "cpu": 0.0,  # fraction of the VM's own cores
+                "mem": 0,
+                "status": vm.get("status", "running"),
+            }
+            for vm in vms
+        }
+        self.tasks: dict[str, dict] = {}
+        self.migrations: list[dict] = []
+        self._task_no = 0
+
+    def set_load(self, vm_loads: dict[int, dict], iowait: dict[str, float] | None = None):
+        for vmid, load in vm_loads.items():
+            vm = self.vms.get(int(vmid))
+            if vm is not None:
+                vm["cpu"] = load.get("cpu", vm["cpu"])
+                vm["mem"] = load.get("mem", vm["mem"])
+        for node, value in (iowait or {}).items():
+            if node in self.nodes:
+                self.nodes[node]["iowait"] = value
+
+    def node_usage(self, node: str) -> tuple[float, float, float]:
+        """Return (cpu fraction, memory used bytes, iowait fraction) for a node"""
+        spec = self.nodes[node]
+        guests = [vm for vm in self.vms.values() if vm["node"] == node and vm["status"] == "running"]
+        cores = spec["base_cpu"] + sum(vm["cpu"] * vm["maxcpu"] for vm in guests)
+        mem = spec["base_mem"] + sum(vm["mem"] for vm in guests)
+        return min(cores / spec["maxcpu"], 1.0), min(mem, spec["maxmem"]), spec["iowait"]
+
+    # -- API endpoints ----------------------------------------------------------------------
+
+    def _cluster_resources(self) -> list[dict]:
+        resources = []
+        for name, spec in self.nodes.items():
+            cpu, mem, _ = self.node_usage(name)
+            resources.append({
+                "id": f"node/{name}", "type": "node", "node": name, "status": "online",
+                "cpu": cpu, "maxcpu": spec["maxcpu"], "mem": mem, "maxmem": spec["maxmem"],
+                "disk": spec["disk"], "maxdisk": spec["maxdisk"],
+            })
+            for storage, shared in ((LOCAL_STORAGE, 0), (SHARED_STORAGE, 1)):
+                resources.append({
+                    "id": f"storage/{name}/{storage}", "type": "storage", "node": name,
+                    "storage": storage, "shared": shared, "status": "available",
+                })
+        for vm in self.vms.values():
+            resources.append({
+                "id": f"qemu/{vm['vmid']}", "type": "qemu", "vmid": vm["vmid"], "name": vm["name"],
+                "node": vm["node"], "status": vm["status"], "template": 0,
+                "cpu": vm["cpu"], "maxcpu": vm["maxcpu"], "mem": vm["mem"], "maxmem": vm["maxmem"],
+                "disk": 0, "maxdisk": vm["maxdisk"],
+            })
+        return resources
+
+    def _node_status(self, node: str) -> dict:
+        cpu, mem, iowait = self.node_usage(node)
+        return {"cpu": cpu, "wait": iowait, "memory": {"used": mem, "total": self.nodes[node]["maxmem"]}}
+
+    def _vm_config(self, vmid: int) -> dict | None:
+        vm = self.vms.get(vmid)
+        if vm is None:
+            return None
+        config = {"name": vm["name"], "cores": vm["maxcpu"], "memory": vm["maxmem"] // 1024 ** 2}
+        if vm["maxdisk"]:
+            config["scsi0"] = f"{vm['storage']}:vm-{vmid}-disk-0,size={vm['maxdisk'] // 1024 ** 3}G"
+        return config
+
+    def _migrate(self, node: str, vmid: int, form: dict) -> tuple[int, dict]:
+        vm = self.vms.get(vmid)
+        target = form.get("target")
+        if vm is None or vm["node"] != node:
+            return 500, {"data": None, "errors": {"vmid": f"VM {vmid} not on {node}"}}
+        if target not in self.nodes or target == node:
+            return 400, {"data": None, "errors": {"target": f"invalid target {target}"}}
+
+        local_disk = vm["maxdisk"] if vm["maxdisk"] and vm["storage"] != SHARED_STORAGE else 0
+        if local_disk and form.get("with-local-disks") != "1":
+            return 500, {"data": None, "message": f"VM {vmid} has local disks, with-local-disks required"}
+        # Memory is copied for a live migration, local disks on top of that
+        moved = (vm["mem"] if form.get("online") == "1" else 0) + local_disk
+        self.migrations.append({
+            "time": self.clock(), "vmid": vmid, "source": node, "target": target,
+            "bytes": moved, "seconds": moved / SIM_MIGRATION_BANDWIDTH,
+        })
+        vm["node"] = target
+
+        self._task_no += 1
+        start = int(self.clock())
+        upid = f"UPID:{node}:{self._task_no:08X}:00000000:{start:08X}:qmigrate:{vmid}:root@pam:"
+        self.tasks[upid] = {"upid": upid, "node": node, "starttime": start, "endtime": start, "status": "OK"}
+        return 200, {"data": upid}
+
+    def handle(self, request: httpx.Request) -> httpx.Response:
+        path = request.url.path.split("/api2/json", 1)[-1]
+        form = {k: v[0] for k, v in parse_qs(request.content.decode()).items()} if request.content else {}
+        status, body = 200, None
+
+        if path == "/cluster/resources":
+            body = {"data": self._cluster_resources()}
+        elif path == "/access/ticket" and request.method == "POST":
+            body = {"data": {"ticket": "PVE:sim", "CSRFPreventionToken": "sim"}}
+        elif m := re.fullmatch(r"/nodes/([^/]+)/status", path):
+            body = {"data": self._node_status(m[1])} if m[1] in self.nodes else None
+        elif m := re.fullmatch(r"/nodes/([^/]+)/rrddata", path):
+            body = {"data": []}  # the simulator records samples itself
+        elif m := re.fullmatch(r"/nodes/([^/]+)/qemu/(\d+)/config", path):
+            config = self._vm_config(int(m[2]))
+            body = {"data": config} if config is not None else None
+        elif m := re.fullmatch(r"/nodes/([^/]+)/qemu/(\d+)/migrate", path):
+            status, body = self._migrate(m[1], int(m[2]), form)
+        elif m := re.fullmatch(r"/nodes/([^/]+)/tasks", path):
+            body = {"data": [task for task in self.tasks.values() if task["node"] == m[1]]}
+        elif m := re.fullmatch(r"/nodes/([^/]+)/tasks/([^/]+)/status", path):
+            task = self.tasks.get(m[2])
+            if task:
+                body = {"data": {"status": "stopped", "exitstatus": task["status"], "upid": task["upid"]}}
+
+        if body is None:
+            status, body = 501, {"data": None, "message": f"{request.method} {path} not simulated"}
+        return httpx.Response(status, content=json.dumps(body), headers={"Content-Type": "application/json"})
+
+    def transport(self) -> httpx.MockTransport:
+        return httpx.MockTransport(self.handle)
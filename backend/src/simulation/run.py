@@ -0,0 +1,177 @@
+"""
+Replay a load trace against a fake Proxmox cluster and run the real rebalance code on it.
+
+    python -m src.simulation.run                          # synthetic, skewed 3-node cluster
+    python -m src.simulation.run --trace trace.json --rebalance-interval 600 --cpu-threshold 70
+
+Prints a JSON report: migrations, bytes moved, node-seconds over threshold and convergence time.
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import math
+import os
+import time
+
+# The services read these at import time; point everything at the fake cluster so that
+# a local .env can never send the simulator's migrations to the real one.
+os.environ["PROXMOX_HOST"] = "sim.invalid"
+os.environ["PROXMOX_HOST_NAME"] = "https://sim.invalid:8006"
+os.environ["PROXMOX_TOKEN"] = "sim"
+os.environ["PROXMOX_USERNAME"] = "root@pam"
+os.environ["PROXMOX_PASSWORD"] = "sim"
+for key in (
+    "DATABASE_URL", "SECRET_KEY", "LDAP_HOST", "LDAP_ADMIN_DN", "LDAP_ADMIN_PASSWORD", "LDAP_BASE_DN",
+    "GUACAMOLE_URL", "GUACAMOLE_USERNAME", "GUACAMOLE_PASSWORD", "GUACAMOLE_URL_EMBED",
+):
+    os.environ.setdefault(key, "postgresql://sim@localhost/sim" if key == "DATABASE_URL" else "sim")
+
+from src.models.metrics import NodeMetrics  # noqa: E402
+from src.simulation.fake_proxmox import FakeProxmox  # noqa: E402
+from src.simulation.traces import load_trace, synthetic_trace  # noqa: E402
+from src.util.proxmox_client import proxmox_async  # noqa: E402
+import src.util.proxmox_ticket as proxmox_ticket  # noqa: E402
+import src.services.inventory_service as inventory_service  # noqa: E402
+import src.services.metrics_sampler as metrics_sampler  # noqa: E402
+import src.services.placement_service as placement_service  # noqa: E402
+import src.services.load_balance_service as load_balance_service  # noqa: E402
+import src.util.schedule as schedule  # noqa: E402
+
+
+class SimClock:
+    """Virtual wall clock advanced by the simulator, one trace step at a time"""
+
+    def __init__(self, start: float):
+        self.now = start
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def _node_metrics(cluster: FakeProxmox) -> dict[str, NodeMetrics]:
+    metrics = {}
+    for node, spec in cluster.nodes.items():
+        cpu, mem, iowait = cluster.node_usage(node)
+        metrics[node] = NodeMetrics(
+            node,
+            cpu * 100,
+            mem / spec["maxmem"] * 100,
+            iowait * 100,
+            disk=spec["disk"] / spec["maxdisk"] * 100,
+            mem_committed=sum(vm["maxmem"] for vm in cluster.vms.values() if vm["node"] == node),
+            mem_total=spec["maxmem"],
+        )
+    return metrics
+
+
+async def simulate(trace: dict, rebalance_interval: int = 900, verbose: bool = False) -> dict:
+    """
+    Step through the trace, feeding each step's node load to the metrics sampler and running
+    load_balance_service.run_rounds() every rebalance_interval seconds of trace time.
+    One sample is recorded per trace step, so the sampler's EWMA/percentile views see the
+    trace at its own resolution.
+    """
+    interval = trace["interval"]
+    clock = SimClock(start=1_700_000_000.0)
+    cluster = FakeProxmox(trace["nodes"], trace["vms"], clock)
+    transport = cluster.transport()
+
+    saved_ttl = inventory_service.INVENTORY_TTL
+    proxmox_async.set_transport(transport)
+    proxmox_ticket.set_transport(transport)
+    metrics_sampler.clock = clock
+    metrics_sampler.clear()
+    inventory_service.INVENTORY_TTL = math.inf  # refreshed explicitly every step
+    inventory_service.invalidate()
+
+    over_threshold = {node: 0 for node in cluster.nodes}
+    last_overloaded = None
+    overloaded = []
+    next_rebalance = rebalance_interval
+    try:
+        for step_no, step in enumerate(trace["steps"]):
+            elapsed = step_no * interval
+            clock.now = 1_700_000_000.0 + elapsed
+            cluster.set_load({int(vmid): load for vmid, load in step.get("vms", {}).items()}, step.get("iowait"))
+            await inventory_service.refresh_async()
+
+            current = _node_metrics(cluster)
+            for node, m in current.items():
+                metrics_sampler.record(node, clock(), m.cpu, m.memory, m.io_delay)
+            overloaded = [node for node, m in current.items() if placement_service.is_overloaded(m)]
+            for node in overloaded:
+                over_threshold[node] += interval
+            if overloaded:
+                last_overloaded = elapsed
+
+            if elapsed >= next_rebalance:
+                next_rebalance += rebalance_interval
+                output = contextlib.nullcontext() if verbose else contextlib.redirect_stdout(io.StringIO())
+                with output:
+                    await load_balance_service.run_rounds()  # no database to take the rebalance lock in
+    finally:
+        proxmox_async.set_transport(None)
+        proxmox_ticket.set_transport(None)
+        metrics_sampler.clock = time.time
+        inventory_service.INVENTORY_TTL = saved_ttl
+        inventory_service.invalidate()
+
+    duration = len(trace["steps"]) * interval
+    converged = not overloaded
+    if last_overloaded is None:
+        convergence_time = 0
+    else:
+        convergence_time = last_overloaded + interval if converged else None
+    return {
+        "duration": duration,
+        "rebalance_interval": rebalance_interval,
+        "migrations": len(cluster.migrations),
+        "bytes_moved": sum(m["bytes"] for m in cluster.migrations),
+        "migration_seconds": round(sum(m["seconds"] for m in cluster.migrations), 1),
+        "time_over_threshold": sum(over_threshold.values()),
+        "time_over_threshold_by_node": over_threshold,
+        "converged": converged,
+        "convergence_time": convergence_time,
+        "final_load": {node: m.to_dict() for node, m in _node_metrics(cluster).items()},
+        "moves": cluster.migrations,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the load balancer against a simulated cluster")
+    parser.add_argument("--trace", help="JSON trace file; a synthetic trace is generated when omitted")
+    parser.add_argument("--nodes", type=int, default=3)
+    parser.add_argument("--vms", type=int, default=30)
+    parser.add_argument("--steps", type=int, default=240)
+    parser.add_argument("--skew", type=float, default=0.6, help="share of synthetic VMs starting on node0")
+    parser.add_argument("--shared", type=float, default=0.5, help="share of synthetic VMs on shared storage")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--rebalance-interval", type=int, default=900, help="seconds of trace time between rebalances")
+    parser.add_argument("--cpu-threshold", type=float)
+    parser.add_argument("--mem-threshold", type=float)
+    parser.add_argument("--io-threshold", type=float)
+    parser.add_argument("--off-peak-hours", help='override OFF_PEAK_HOURS, e.g. "0-23" to allow local-disk moves all run')
+    parser.add_argument("--verbose", action="store_true", help="show the rebalancer's own output")
+    args = parser.parse_args()
+
+    if args.cpu_threshold is not None:
+        placement_service.CPU_THRESHOLD = args.cpu_threshold
+    if args.mem_threshold is not None:
+        placement_service.MEM_THRESHOLD = args.mem_threshold
+    if args.io_threshold is not None:
+        placement_service.IO_DELAY_THRESHOLD = args.io_threshold
+    if args.off_peak_hours is not None:
+        schedule.OFF_PEAK_HOURS = schedule.parse_hours(args.off_peak_hours)
+
+    if args.trace:
+        trace = load_trace(args.trace)
+    else:
+        trace = synthetic_trace(args.nodes, args.vms, args.steps, skew=args.skew, shared=args.shared, seed=args.seed)
+    report = asyncio.run(simulate(trace, args.rebalance_interval, args.verbose))
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+A trace is a dict:
+{
+  "interval": 60,                                  # seconds between steps
+  "nodes": {"node0": {"maxcpu": 32, "maxmem": 137438953472, "base_cpu": 1, "base_mem": 4294967296}},
+  "vms": [{"vmid": 101, "name": "web", "node": "node0", "maxcpu": 4, "maxmem": 8589934592,
+           "maxdisk": 34359738368, "storage": "ceph"}],     # storage "ceph" is shared, anything else local
+  "steps": [{"vms": {"101": {"cpu": 0.5, "mem": 4294967296}}, "iowait": {"node0": 0.02}}]
+}
+cpu values are fractions of the VM's own cores (as in /cluster/resources); iowait is a fraction.
+"""
+import json
+import math
+import random
+
+GIB = 1024 ** 3
+
+
+def load_trace(path: str) -> dict:
+    with open(path) as f:
+        trace = json.load(f)
+    for key in ("nodes", "vms", "steps"):
+        if key not in trace:
+            raise ValueError(f"Trace {path} has no {key!r} section")
+    trace.setdefault("interval", 60)
+    return trace
+
+
+def synthetic_trace(
+    nodes: int = 3,
+    vms: int = 30,
+    steps: int = 240,
+    interval: int = 60,
+    skew: float = 0.6,
+    shared: float = 0.5,
+    seed: int = 0,
+) -> dict:
+    """
+    Generate a skewed cluster: `skew` of the VMs start on the first node, `shared` of them on shared storage.
+    Each VM follows a daily-ish sine wave with noise and occasional short spikes
+    (the kind of apt-upgrade burst the rebalancer should ignore).
+    """
+    rng = random.Random(seed)
+    node_names = [f"node{i}" for i in range(nodes)]
+    node_specs = {
+        name: {"maxcpu": 32, "maxmem": 128 * GIB, "base_cpu": 1.0, "base_mem": 4 * GIB}
+        for name in node_names
+    }
+
+    vm_specs = []
+    profiles = {}
+    for i in range(vms):
+        vmid = 100 + i
+        node = node_names[0] if rng.random() < skew else rng.choice(node_names[1:] or node_names)
+        maxcpu = rng.choice((2, 4, 8))
+        maxmem = rng.choice((2, 4, 8, 16)) * GIB
+        vm_specs.append({
+            "vmid": vmid, "name": f"sim-{vmid}", "node": node, "maxcpu": maxcpu, "maxmem": maxmem,
+            "maxdisk": 32 * GIB, "storage": "ceph" if rng.random() < shared else "local-lvm",
+        })
+        profiles[vmid] = {
+            "base": rng.uniform(0.1, 0.6),
+            "amplitude": rng.uniform(0.0, 0.3),
+            "phase": rng.uniform(0, 2 * math.pi),
+            "mem": rng.uniform(0.4, 0.9),
+        }
+
+    day = 24 * 3600
+    trace_steps = []
+    for step in range(steps):
+        t = step * interval
+        loads = {}
+        for vm in vm_specs:
+            p = profiles[vm["vmid"]]
+            cpu = p["base"] + p["amplitude"] * math.sin(2 * math.pi * t / day + p["phase"]) + rng.gauss(0, 0.03)
+            if rng.random() < 0.01:
+                cpu = 1.0  # short burst
+            loads[str(vm["vmid"])] = {"cpu": min(max(cpu, 0.0), 1.0), "mem": int(vm["maxmem"] * p["mem"])}
+        iowait = {name: max(rng.gauss(0.02, 0.01), 0.0) for name in node_names}
+        trace_steps.append({"vms": loads, "iowait": iowait})
+
+    return {"interval": interval, "nodes": node_specs, "vms": vm_specs, "steps": trace_steps}
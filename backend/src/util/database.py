@@ -0,0 +1,18 @@
+from dotenv import load_dotenv
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker, declarative_base
+from src.util.env import get_required_env
+
+load_dotenv()
+
+DB_URL = get_required_env("DATABASE_URL")
+
+engine = create_engine(DB_URL, pool_pre_ping=True)
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+Base = declarative_base()
+
+
+def init_db():
+    """Create the backend's own tables; the Guacamole schema is created by database/init"""
+    import src.models.db_models  # noqa: F401 - registers the models on Base
+    Base.metadata.create_all(bind=engine)
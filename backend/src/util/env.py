@@ -6,3 +6,13 @@ def get_required_env(key: str) -> str:
     if not value:
         raise ValueError(f"Required environment variable {key} is not set")
     return value
+
+def get_int_env(key: str, default: int) -> int:
+    """Get optional integer environment variable or fall back to a default"""
+    value = os.getenv(key)
+    if not value:
+        return default
+    try:
+        return int(value)
+    except ValueError:
+        raise ValueError(f"Environment variable {key} must be an integer, got {value!r}")
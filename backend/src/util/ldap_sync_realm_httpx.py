@@ -1,5 +1,5 @@
-import httpx
 from typing import Literal
+from src.util.proxmox_ticket import get_ticket_session
 
 def sync_ldap_realm(
     host: str,
@@ -25,35 +25,14 @@ def sync_ldap_realm(
     :return: Parsed response JSON from sync
     """
 
-    with httpx.Client(verify=verify_ssl) as client:
-        # 1. Authenticate and get ticket and CSRF token
-        auth_resp = client.post(
-            f"{host}/api2/json/access/ticket",
-            data={"username": username, "password": password}
-        )
-        auth_resp.raise_for_status()
-        auth_data = auth_resp.json()["data"]
+    session = get_ticket_session(host, username, password, verify_ssl)
 
-        ticket = auth_data["ticket"]
-        csrf = auth_data["CSRFPreventionToken"]
+    sync_payload = {
+        "scope": scope,
+        "remove-vanished": remove_vanished,
+    }
 
-        # 2. Call the sync API
-        headers = {"CSRFPreventionToken": csrf}
-        cookies = {"PVEAuthCookie": ticket}
+    if dry_run:
+        sync_payload["dry-run"] = "1"
 
-        sync_payload = {
-            "scope": scope,
-            "remove-vanished": remove_vanished,
-        }
-
-        if dry_run:
-            sync_payload["dry-run"] = "1"
-
-        sync_resp = client.post(
-            f"{host}/api2/json/access/domains/{realm}/sync",
-            headers=headers,
-            cookies=cookies,
-            data=sync_payload
-        )
-        sync_resp.raise_for_status()
-        return sync_resp.json()
\ No newline at end of file
+    return session.post(f"/access/domains/{realm}/sync", data=sync_payload)
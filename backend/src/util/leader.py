@@ -0,0 +1,103 @@
+import asyncio
+import zlib
+from contextlib import asynccontextmanager
+from sqlalchemy import create_engine, text
+from sqlalchemy.pool import NullPool
+from src.util.database import DB_URL
+
+LEADER_RETRY_INTERVAL = 15  # seconds between attempts to take over a loop
+LEADER_CHECK_INTERVAL = 10  # seconds between checks that the lock connection is still alive
+
+# Namespace for the two-key form of the advisory lock functions, so names cannot clash with other locks
+_LEADER_LOCK_NAMESPACE = 7301
+
+# Lock connections live outside the pool: closing one (or the process dying) releases the lock
+_lock_engine = create_engine(DB_URL, poolclass=NullPool, pool_pre_ping=True)
+
+
+def _lock_key(name: str) -> int:
+    return zlib.crc32(name.encode()) & 0x7FFFFFFF
+
+
+def _try_acquire(name: str):
+    """Return an open connection holding the leader lock for name, or None if another process holds it"""
+    conn = _lock_engine.connect()
+    try:
+        acquired = conn.execute(
+            text("SELECT pg_try_advisory_lock(:namespace, :key)"),
+            {"namespace": _LEADER_LOCK_NAMESPACE, "key": _lock_key(name)},
+        ).scalar()
+        conn.commit()
+    except Exception:
+        conn.close()
+        raise
+    if not acquired:
+        conn.close()
+        return None
+    return conn
+
+
+def _still_connected(conn) -> bool:
+    try:
+        conn.execute(text("SELECT 1"))
+        conn.commit()
+        return True
+    except Exception:
+        return False
+
+
+def _release(conn):
+    try:
+        conn.close()
+    except Exception:
+        pass
+
+
+async def run_as_leader(name: str, loop_factory):
+    """
+    Run loop_factory() in only one process of the deployment.
+    The process that holds the Postgres advisory lock for name runs the loop; the others retry
+    every LEADER_RETRY_INTERVAL and take over once the leader's connection goes away.
+    """
+    while True:
+        try:
+            conn = await asyncio.to_thread(_try_acquire, name)
+        except Exception as e:
+            print(f"Leader election for {name} failed: {e}")
+            conn = None
+        if conn is None:
+            await asyncio.sleep(LEADER_RETRY_INTERVAL)
+            continue
+
+        print(f"This process is now the leader for {name}")
+        task = asyncio.create_task(loop_factory())
+        try:
+            while True:
+                done, _ = await asyncio.wait({task}, timeout=LEADER_CHECK_INTERVAL)
+                if done:
+                    error = task.exception()
+                    print(f"Leader loop {name} stopped: {error}" if error else f"Leader loop {name} finished")
+                    break
+                if not await asyncio.to_thread(_still_connected, conn):
+                    # The lock died with the connection; someone else may already be leader
+                    print(f"Lost the leader lock for {name}")
+                    break
+        finally:
+            if not task.done():
+                task.cancel()
+            await asyncio.to_thread(_release, conn)
+        await asyncio.sleep(LEADER_RETRY_INTERVAL)
+
+
+@asynccontextmanager
+async def cluster_lock(name: str):
+    """
+    Hold the advisory lock for name across all processes for the duration of the block.
+    Yields whether it was acquired; does not wait if another process holds it.
+    """
+    conn = await asyncio.to_thread(_try_acquire, name)
+    try:
+        yield conn is not None
+    finally:
+        if conn is not None:
+            await asyncio.to_thread(_release, conn)
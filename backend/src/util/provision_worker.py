@@ -8,59 +8,126 @@ from fastapi import HTTPException
 import src.services.proxmox_service as proxmox_service
 import asyncio
 import src.services.guac_service as guac_service
+import src.services.warm_pool_service as warm_pool_service
+import src.services.vmid_allocator as vmid_allocator
 
+CLONE_TIMEOUT = 900  # seconds; a full clone of a large template can take several minutes
+CONFIG_TIMEOUT = 120
+START_TIMEOUT = 180
+MIGRATE_TIMEOUT = 1800
 
-async def provision_worker(req: ProvisionRequest):
-    if req.os not in SupportedOS:
-        raise HTTPException(400, detail="Unsupported OS template requested")
 
-    template_vmid = OS_TEMPLATE_MAP[req.os]
-    template_node = proxmox_service.get_node_by_vmid(template_vmid)
-    if not template_node:
-        raise HTTPException(400, detail="Template VM not found")
+async def wait_for_step(step: str, upid: str | None, timeout: int):
+    """Wait for the Proxmox task behind a provisioning step, turning failures into HTTP errors"""
+    if not upid:
+        return  # the step finished synchronously
+    try:
+        await proxmox_util.wait_for_task_completion(upid, timeout=timeout)
+    except Exception as e:
+        raise HTTPException(500, detail=f"{step} failed: {str(e)}")
 
-    target_node = proxmox_service.pick_best_node()
-    vmid = proxmox_service.get_next_vmid()
-    name = f"{req.os.value.lower()}-{vmid}"
 
-    clone_result = await proxmox_service.clone_vm(template_node, template_vmid, vmid, name)
-    if "error" in clone_result:
-        raise HTTPException(400, detail=clone_result["error"])
-
-    await asyncio.sleep(160)
+async def provision_worker(req: ProvisionRequest, target_node: str | None = None, on_stage=None):
+    """
+    Clone (or take from the warm pool), configure and start a VM for the request.
+    on_stage is an optional coroutine function called with the name of each stage as it starts.
+    """
+    async def report(stage: str):
+        if on_stage is not None:
+            await on_stage(stage)
 
+    if req.os not in SupportedOS:
+        raise HTTPException(400, detail="Unsupported OS template requested")
 
-    provision_result = proxmox_service.provision_cloud_init_vm_with_retry(template_node, vmid, req)
-    if "error" in provision_result:
-        raise HTTPException(400, detail=provision_result["error"])
+    pooled = await warm_pool_service.claim(req.os, target_node)
+    if pooled:
+        # A pre-cloned VM already sits stopped on a node with headroom; no clone needed
+        vmid, source_node = pooled
+        # Keep the node the queue reserved; a pool VM parked elsewhere is moved there before it starts
+        target_node = target_node or source_node
+        name = f"{req.os.value.lower()}-{vmid}"
+        print(f"Using warm pool VM {vmid} on {source_node} for {req.os.value}")
+    else:
+        template_vmid = OS_TEMPLATE_MAP[req.os]
+        template_node = proxmox_service.get_node_by_vmid(template_vmid)
+        if not template_node:
+            raise HTTPException(400, detail="Template VM not found")
 
-    await asyncio.sleep(5)
+        if target_node is None:
+            vm_maxmem = await asyncio.to_thread(proxmox_service.get_template_maxmem, req.os)
+            target_node = await proxmox_service.pick_best_node(vm_maxmem=vm_maxmem)
+            if not target_node:
+                raise HTTPException(503, detail="No node has enough free capacity for this VM")
+        source_vmid, clone_from_node, source_node = await asyncio.to_thread(
+            proxmox_service.resolve_clone_source, template_vmid, target_node
+        )
+        # A linked clone stays tied to the template's storage, so it cannot be migrated afterwards
+        full_clone = not req.linked_clone or source_node != target_node
+        if req.linked_clone and full_clone:
+            print(f"Template {template_vmid} cannot be linked-cloned onto {target_node}, using a full clone")
+        vmid = await asyncio.to_thread(proxmox_service.get_next_vmid, req.username)
+        name = f"{req.os.value.lower()}-{vmid}"
 
+        await report("cloning")
+        clone_result = await proxmox_service.clone_vm(
+            clone_from_node, source_vmid, vmid, name, target_node=source_node, full=full_clone
+        )
+        if "error" in clone_result:
+            await asyncio.to_thread(vmid_allocator.release, vmid)
+            raise HTTPException(400, detail=clone_result["error"])
 
-    start_result = proxmox_service.start_vm(template_node, vmid)
-    if "error" in start_result:
-        raise HTTPException(400, detail=start_result["error"])
+    # From here on the VM exists on the cluster; remove it again if any later step fails
+    try:
+        if not pooled:
+            await wait_for_step("Clone", clone_result["upid"], CLONE_TIMEOUT)
+        return await _configure_and_start(req, vmid, name, source_node, target_node, pooled is not None, report)
+    except Exception:
+        await proxmox_service.discard_vm(vmid)
+        raise
 
-    await asyncio.sleep(5)  # wait for VM to start
 
-    if template_node != target_node:
-        migrate_result = proxmox_service.migrate_vm(
+async def _configure_and_start(req: ProvisionRequest, vmid: int, name: str, source_node: str,
+                               target_node: str, pooled: bool, report) -> ProvisionResponse:
+    if source_node != target_node:
+        # The VM has not been started yet, so an offline migration is enough
+        await report("migrating")
+        migrate_result = await asyncio.to_thread(
+            proxmox_service.migrate_vm,
             vmid=vmid,
-            source_node=template_node,
+            source_node=source_node,
             target_node=target_node,
+            online=False,
         )
         if "error" in migrate_result:
             raise HTTPException(400, detail=migrate_result["error"])
-        node_to_check = target_node
+        await wait_for_step("Migration", migrate_result.get("data"), MIGRATE_TIMEOUT)
     else:
-        print("Using same node for template and target, skipping migration")
-        node_to_check = template_node
+        print("VM already on target node, skipping migration")
+
+    await report("configuring")
+    provision_result = await asyncio.to_thread(
+        proxmox_service.provision_cloud_init_vm_with_retry, target_node, vmid, req,
+        name=name if pooled else None,
+    )
+    if "error" in provision_result:
+        raise HTTPException(400, detail=provision_result["error"])
+    await wait_for_step("Cloud-init config", provision_result.get("upid"), CONFIG_TIMEOUT)
+
+    await report("starting")
+    try:
+        start_upid = await asyncio.to_thread(proxmox_service.start_vm, target_node, vmid)
+    except Exception as e:
+        raise HTTPException(400, detail=f"Failed to start VM: {str(e)}")
+    await wait_for_step("Start", start_upid, START_TIMEOUT)
 
-    ip = proxmox_service.wait_for_first_ip(node_to_check, vmid)
+    await report("waiting_for_ip")
+    ip = await asyncio.to_thread(proxmox_service.wait_for_first_ip, target_node, vmid)
     if not ip:
         raise HTTPException(500, detail="Failed to retrieve IP address for the new VM")
-    print(f"Provisioned VM {vmid} with IP {ip} on node {node_to_check}")
-    guac_service.create_ssh_connection(
+    print(f"Provisioned VM {vmid} with IP {ip} on node {target_node}")
+    await report("creating_connection")
+    await asyncio.to_thread(
+        guac_service.create_ssh_connection,
         name=name,
         hostname=ip,
         username=req.username,
@@ -68,4 +135,4 @@ async def provision_worker(req: ProvisionRequest):
         max_connections=2,
         max_connections_per_user=1
     )
-    return ProvisionResponse(vmid=vmid, ip=ip, node=node_to_check)
\ No newline at end of file
+    return ProvisionResponse(vmid=vmid, ip=ip, node=target_node)
@@ -0,0 +1,88 @@
+import asyncio
+import httpx
+from src.util.env import get_required_env
+
+
+class AsyncProxmoxClient:
+    """
+    Minimal asyncio Proxmox API client using API-token auth.
+    All requests share one keep-alive httpx.AsyncClient per event loop.
+    """
+
+    def __init__(
+        self,
+        host: str,
+        user: str,
+        token_name: str,
+        token_value: str,
+        port: int = 8006,
+        verify_ssl: bool = False,
+        timeout: float = 30,
+        max_connections: int = 50,
+        transport: httpx.AsyncBaseTransport | None = None,
+    ):
+        self.base_url = f"https://{host}:{port}/api2/json"
+        self._headers = {"Authorization": f"PVEAPIToken={user}!{token_name}={token_value}"}
+        self._verify_ssl = verify_ssl
+        self._timeout = timeout
+        self._limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_connections // 2,
+            keepalive_expiry=60,
+        )
+        self._transport = transport
+        self._client: httpx.AsyncClient | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+
+    def set_transport(self, transport: httpx.AsyncBaseTransport | None):
+        """Route all further requests through another transport, e.g. the simulator's fake cluster"""
+        self._transport = transport
+        self._client = None
+
+    def _get_client(self) -> httpx.AsyncClient:
+        # httpx connection pools are bound to the loop that created them
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._client.is_closed or self._loop is not loop:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                headers=self._headers,
+                verify=self._verify_ssl,
+                timeout=self._timeout,
+                limits=self._limits,
+                transport=self._transport,
+            )
+            self._loop = loop
+        return self._client
+
+    async def request(self, method: str, path: str, params: dict | None = None, data: dict | None = None):
+        """Send a request and return the 'data' member of the Proxmox response"""
+        resp = await self._get_client().request(method, path, params=params, data=data)
+        resp.raise_for_status()
+        return resp.json().get("data")
+
+    async def get(self, path: str, **params):
+        return await self.request("GET", path, params=params or None)
+
+    async def post(self, path: str, **data):
+        return await self.request("POST", path, data=data or None)
+
+    async def put(self, path: str, **data):
+        return await self.request("PUT", path, data=data or None)
+
+    async def delete(self, path: str, **params):
+        return await self.request("DELETE", path, params=params or None)
+
+    async def aclose(self):
+        if self._client is not None and not self._client.is_closed:
+            await self._client.aclose()
+        self._client = None
+
+
+proxmox_async = AsyncProxmoxClient(
+    get_required_env("PROXMOX_HOST"),
+    user="root@pam",
+    token_name="guac-api",
+    token_value=get_required_env("PROXMOX_TOKEN"),
+    verify_ssl=False,
+    timeout=30,
+)
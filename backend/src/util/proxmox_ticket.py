@@ -0,0 +1,110 @@
+import threading
+import time
+import httpx
+
+TICKET_LIFETIME = 2 * 60 * 60  # Proxmox tickets expire after 2 hours
+TICKET_RENEW_MARGIN = 15 * 60  # renew this long before expiry
+
+
+class ProxmoxTicketSession:
+    """
+    Cookie-authenticated Proxmox session.
+    Holds one pooled httpx.Client and a ticket/CSRF pair that is renewed before it expires.
+    Safe to share between threads.
+    """
+
+    def __init__(
+        self,
+        host: str,
+        username: str,
+        password: str,
+        verify_ssl: bool = False,
+        timeout: float = 30,
+        transport: httpx.BaseTransport | None = None,
+    ):
+        self.host = host
+        self.username = username
+        self._password = password
+        self._client = httpx.Client(
+            base_url=f"{host}/api2/json",
+            verify=verify_ssl,
+            timeout=timeout,
+            limits=httpx.Limits(max_connections=20, max_keepalive_connections=10, keepalive_expiry=60),
+            transport=transport,
+        )
+        self._lock = threading.Lock()
+        self._ticket: str | None = None
+        self._csrf: str | None = None
+        self._issued_at = 0.0
+
+    def _login(self):
+        auth_resp = self._client.post(
+            "/access/ticket",
+            data={"username": self.username, "password": self._password}
+        )
+        auth_resp.raise_for_status()
+        auth_data = auth_resp.json()["data"]
+        self._ticket = auth_data["ticket"]
+        self._csrf = auth_data["CSRFPreventionToken"]
+        self._issued_at = time.monotonic()
+
+    def _credentials(self, force_renew: bool = False) -> tuple[str, str]:
+        with self._lock:
+            expired = time.monotonic() - self._issued_at > TICKET_LIFETIME - TICKET_RENEW_MARGIN
+            if force_renew or not self._ticket or expired:
+                self._login()
+            return self._ticket, self._csrf
+
+    def get_ticket(self) -> str:
+        """Return a valid PVEAuthCookie value"""
+        return self._credentials()[0]
+
+    def request(self, method: str, path: str, data: dict | None = None, params: dict | None = None) -> dict:
+        """Send an authenticated request and return the response JSON"""
+        for attempt in range(2):
+            ticket, csrf = self._credentials(force_renew=attempt > 0)
+            headers = {"Cookie": f"PVEAuthCookie={ticket}"}
+            if method.upper() != "GET":
+                headers["CSRFPreventionToken"] = csrf
+            resp = self._client.request(method, path, headers=headers, data=data, params=params)
+            # The ticket can be invalidated server-side (e.g. key rotation); log in again once
+            if resp.status_code == 401 and attempt == 0:
+                continue
+            resp.raise_for_status()
+            return resp.json()
+
+    def get(self, path: str, params: dict | None = None) -> dict:
+        return self.request("GET", path, params=params)
+
+    def post(self, path: str, data: dict | None = None) -> dict:
+        return self.request("POST", path, data=data)
+
+
+_sessions: dict[tuple[str, str, bool], ProxmoxTicketSession] = {}
+_sessions_lock = threading.Lock()
+_transport: httpx.BaseTransport | None = None
+
+
+def get_ticket_session(host: str, username: str, password: str, verify_ssl: bool = False) -> ProxmoxTicketSession:
+    """Return the process-wide session for a host and user, creating it on first use"""
+    key = (host, username, verify_ssl)
+    with _sessions_lock:
+        session = _sessions.get(key)
+        if session is None:
+            session = ProxmoxTicketSession(host, username, password, verify_ssl=verify_ssl, transport=_transport)
+            _sessions[key] = session
+        return session
+
+
+def close_all_sessions():
+    with _sessions_lock:
+        for session in _sessions.values():
+            session._client.close()
+        _sessions.clear()
+
+
+def set_transport(transport: httpx.BaseTransport | None):
+    """Make new sessions use another transport, e.g. the simulator's fake cluster; drops existing sessions"""
+    global _transport
+    close_all_sessions()
+    _transport = transport
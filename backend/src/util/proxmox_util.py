@@ -3,9 +3,9 @@ from proxmoxer import ProxmoxAPI
 from src.util.env import get_required_env
 from src.util.ldap_sync_realm_httpx import sync_ldap_realm
 from src.models.enums import SupportedOS, OS_TEMPLATE_MAP
-import httpx
+from src.util.proxmox_ticket import get_ticket_session
+from src.util.task_watcher import get_task_watcher
 import re
-import asyncio
 UPID_RE = re.compile(r"UPID:(?P<node>[^:]+):")
 proxmox = ProxmoxAPI(
     get_required_env("PROXMOX_HOST"),
@@ -41,34 +41,34 @@ def parse_smart_attributes(smart_data):
         "UDMA_CRC_Error_Count": attributes.get("UDMA_CRC_Error_Count", {}).get("raw"),
     }
 
-CPU_THRESHOLD = 80  # Percentage
-MEM_THRESHOLD = 80 # Percentage
-IO_DELAY_THRESHOLD = 80 # percentage
+DISK_KEY_RE = re.compile(r"^(scsi|virtio|sata|ide|efidisk|tpmstate|unused)\d+$")
+SIZE_UNITS = {"K": 1024, "M": 1024 ** 2, "G": 1024 ** 3, "T": 1024 ** 4}
 
-def is_overloaded(node_metrics: dict) -> bool:
-    return (
-        node_metrics.get("CPU", 0) > CPU_THRESHOLD or
-        node_metrics.get("Memory", 0) > MEM_THRESHOLD or
-        node_metrics.get("IO_delay", 0) > IO_DELAY_THRESHOLD
-    )
+def parse_size(size: str | None) -> int:
+    """Convert a Proxmox size string such as '32G' to bytes"""
+    if not size:
+        return 0
+    unit = size[-1].upper()
+    if unit in SIZE_UNITS:
+        return int(float(size[:-1]) * SIZE_UNITS[unit])
+    return int(float(size))
 
-def select_idle_target(metrics: dict, exclude_node: str) -> str | None:
-    candidates = {
-        node: m for node, m in metrics.items()
-        if node != exclude_node and not is_overloaded(m)
-    }
-    if not candidates:
-        return None
-    # Sort by lowest CPU, then MEM, then IO delay
-    sorted_nodes = sorted(
-        candidates.items(),
-        key=lambda item: (
-            item[1].get("CPU", 100),
-            item[1].get("Memory", 100),
-            item[1].get("IO_Delay", 100)
-        )
-    )
-    return sorted_nodes[0][0]
+def parse_vm_disks(vm_config: dict) -> list[dict]:
+    """
+    Extract the disks of a qemu config as dicts with key, storage, volume and size (bytes).
+    CD-ROM drives and empty drives are skipped.
+    """
+    disks = []
+    for key, value in vm_config.items():
+        if not DISK_KEY_RE.match(key) or not isinstance(value, str):
+            continue
+        volume, *options = value.split(",")
+        opts = dict(opt.split("=", 1) for opt in options if "=" in opt)
+        if opts.get("media") == "cdrom" or volume == "none" or ":" not in volume:
+            continue
+        storage = volume.split(":", 1)[0]
+        disks.append({"key": key, "storage": storage, "volume": volume, "size": parse_size(opts.get("size"))})
+    return disks
 
 # HTTPX-based Migration Function
 
@@ -98,51 +98,21 @@ def migrate_vm_httpx(
     :return: Response JSON or error
     """
 
-    with httpx.Client(verify=verify_ssl) as client:
-        # 1. Authenticate
-        auth_resp = client.post(
-            f"{host}/api2/json/access/ticket",
-            data={"username": username, "password": password}
-        )
-        auth_resp.raise_for_status()
-        auth_data = auth_resp.json()["data"]
-
-        ticket = auth_data["ticket"]
-        csrf = auth_data["CSRFPreventionToken"]
+    session = get_ticket_session(host, username, password, verify_ssl)
 
-        # 2. Prepare headers and cookies
-        headers = {"CSRFPreventionToken": csrf}
-        cookies = {"PVEAuthCookie": ticket}
-
-        # 3. Prepare migration parameters
-        payload = {
-            "target": target_node,
-            "online": "1" if online else "0"
-        }
+    payload = {
+        "target": target_node,
+        "online": "1" if online else "0"
+    }
 
-        if with_local_disks:
-            payload["with-local-disks"] = "1"
+    if with_local_disks:
+        payload["with-local-disks"] = "1"
 
-        # 4. Send migration request
-        migrate_resp = client.post(
-            f"{host}/api2/json/nodes/{source_node}/qemu/{vmid}/migrate",
-            headers=headers,
-            cookies=cookies,
-            data=payload
-        )
-        migrate_resp.raise_for_status()
-        return migrate_resp.json()
+    return session.post(f"/nodes/{source_node}/qemu/{vmid}/migrate", data=payload)
 
-async def wait_for_task_completion(upid: str, node: str, *, timeout: int = 120) -> None:
-    deadline = time.time() + timeout
-    while time.time() < deadline:
-        task_json = proxmox.nodes(node).tasks(upid).status.get()
-        data = task_json.get("data", {})
-        status = data.get("status")
-        exitstatus = data.get("exitstatus")
-        if status == "stopped":
-            if exitstatus == "OK":
-                return
-            raise RuntimeError(f"Task failed: {exitstatus}")
-        await asyncio.sleep(2)
-    raise TimeoutError(f"Task {upid} did not complete in {timeout} seconds")
+async def wait_for_task_completion(upid: str, node: str | None = None, *, timeout: int = 120) -> str:
+    """
+    Wait for a Proxmox task to finish and return its exit status.
+    The node is taken from the UPID; the argument is kept for older callers.
+    """
+    return await get_task_watcher().wait(upid, timeout=timeout)
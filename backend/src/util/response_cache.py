@@ -0,0 +1,96 @@
+import asyncio
+import hashlib
+import json
+import threading
+import time
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+
+# Short-lived cache of JSON responses keyed by (route, user).
+# Entries are per process: mutating routes invalidate their own worker's cache and the TTL bounds
+# how long other workers can serve a stale list.
+
+_lock = threading.Lock()
+_entries: dict[tuple[str, str], tuple[float, bytes, str]] = {}  # (route, user) -> (expires, body, etag)
+_inflight: dict[tuple[str, str], tuple[asyncio.Future, int]] = {}  # (route, user) -> (build, generation it started in)
+_generation = 0  # bumped by invalidate(), so a build that raced an invalidation is not stored
+
+
+def _encode(payload) -> tuple[bytes, str]:
+    body = json.dumps(jsonable_encoder(payload), separators=(",", ":")).encode()
+    return body, f'"{hashlib.sha1(body).hexdigest()}"'
+
+
+def _respond(request: Request, body: bytes, etag: str) -> Response:
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if etag in (tag.strip() for tag in request.headers.get("if-none-match", "").split(",")):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+def _lookup(key: tuple[str, str]) -> tuple[bytes, str] | None:
+    with _lock:
+        entry = _entries.get(key)
+    if entry and entry[0] > time.monotonic():
+        return entry[1], entry[2]
+    return None
+
+
+def _store(key: tuple[str, str], payload, ttl: float, generation: int) -> tuple[bytes, str]:
+    body, etag = _encode(payload)
+    # Error payloads are passed through but never cached
+    if not (isinstance(payload, dict) and "error" in payload):
+        with _lock:
+            if generation == _generation:
+                _entries[key] = (time.monotonic() + ttl, body, etag)
+    return body, etag
+
+
+def cached_response(request: Request, route: str, user: str, ttl: float, build) -> Response:
+    """Serve build() for (route, user) from the cache, rebuilding after ttl seconds; honours If-None-Match"""
+    key = (route, user)
+    cached = _lookup(key)
+    if cached is None:
+        generation = _generation
+        cached = _store(key, build(), ttl, generation)
+    return _respond(request, *cached)
+
+
+def _drop_inflight(key: tuple[str, str], inflight: tuple[asyncio.Future, int]):
+    with _lock:
+        if _inflight.get(key) is inflight:
+            del _inflight[key]
+
+
+async def cached_response_async(request: Request, route: str, user: str, ttl: float, build) -> Response:
+    """Same as cached_response() for a coroutine function; concurrent misses share one build"""
+    key = (route, user)
+    cached = _lookup(key)
+    if cached is None:
+        with _lock:
+            inflight = _inflight.get(key)
+            started = inflight is None
+            if started:
+                inflight = (asyncio.ensure_future(build()), _generation)
+                _inflight[key] = inflight
+        future, generation = inflight
+        if started:
+            future.add_done_callback(lambda _: _drop_inflight(key, inflight))
+        payload = await asyncio.shield(future)
+        # Stored under the generation the build started in, so a build that raced an invalidation is not cached
+        cached = _store(key, payload, ttl, generation)
+    return _respond(request, *cached)
+
+
+def invalidate(*routes: str):
+    """Drop the cached responses of the given routes for every user (all routes if none given)"""
+    global _generation
+    with _lock:
+        _generation += 1
+        for key in list(_entries):
+            if not routes or key[0] in routes:
+                del _entries[key]
+        # Builds already running may have read the old state; later requests start a fresh one
+        for key in list(_inflight):
+            if not routes or key[0] in routes:
+                del _inflight[key]
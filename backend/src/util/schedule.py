@@ -0,0 +1,31 @@
+import os
+from datetime import datetime
+
+
+def parse_hours(spec: str) -> set[int]:
+    """Parse an hour spec like "0-6,20-23" into a set of hours (0-23)"""
+    hours = set()
+    for part in spec.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        if "-" in part:
+            start, end = (int(h) for h in part.split("-", 1))
+        else:
+            start = end = int(part)
+        if not (0 <= start <= 23 and 0 <= end <= 23):
+            raise ValueError(f"Invalid hour range {part!r}")
+        if start <= end:
+            hours.update(range(start, end + 1))
+        else:  # wraps past midnight, e.g. 22-5
+            hours.update(range(start, 24))
+            hours.update(range(0, end + 1))
+    return hours
+
+
+OFF_PEAK_HOURS = parse_hours(os.getenv("OFF_PEAK_HOURS", "0-6,20-23"))
+
+
+def is_off_peak(now: datetime | None = None) -> bool:
+    """Whether the (local) hour is in the configured off-peak window"""
+    return (now or datetime.now()).hour in OFF_PEAK_HOURS
@@ -0,0 +1,129 @@
+import asyncio
+import weakref
+from src.util.proxmox_client import proxmox_async
+
+TASK_POLL_MIN = 1.0  # seconds between polls right after a task was added or finished
+TASK_POLL_MAX = 10.0
+TASK_POLL_BACKOFF = 1.5
+
+
+class TaskFailedError(RuntimeError):
+    def __init__(self, upid: str, exitstatus: str):
+        super().__init__(f"Task {upid} failed: {exitstatus}")
+        self.upid = upid
+        self.exitstatus = exitstatus
+
+
+def parse_upid(upid: str) -> tuple[str, int]:
+    """Return (node, starttime) from a UPID:node:pid:pstart:starttime:type:id:user: string"""
+    parts = upid.split(":")
+    if len(parts) < 8 or parts[0] != "UPID":
+        raise ValueError(f"Invalid UPID: {upid}")
+    return parts[1], int(parts[4], 16)
+
+
+def _succeeded(exitstatus: str | None) -> bool:
+    return exitstatus == "OK" or (exitstatus or "").startswith("WARNINGS")
+
+
+class TaskWatcher:
+    """
+    Waits for Proxmox tasks to finish.
+    All in-flight UPIDs on a node are multiplexed into one /nodes/{node}/tasks poll,
+    which backs off while nothing changes.
+    """
+
+    def __init__(self, client=proxmox_async):
+        self._client = client
+        self._waiters: dict[str, dict[str, list[asyncio.Future]]] = {}  # node -> upid -> futures
+        self._pollers: dict[str, asyncio.Task] = {}
+        self._wakeups: dict[str, asyncio.Event] = {}
+
+    async def wait(self, upid: str, timeout: float = 600) -> str:
+        """Wait until the task stops; return its exit status or raise TaskFailedError"""
+        node, _ = parse_upid(upid)
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.setdefault(node, {}).setdefault(upid, []).append(future)
+        self._wake(node)
+        try:
+            return await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            raise TimeoutError(f"Task {upid} did not complete in {timeout} seconds")
+        finally:
+            futures = self._waiters.get(node, {}).get(upid, [])
+            if future in futures:
+                futures.remove(future)
+            if not futures:
+                self._waiters.get(node, {}).pop(upid, None)
+
+    def _wake(self, node: str):
+        """Start the node's poller, or make a sleeping one poll again right away"""
+        self._wakeups.setdefault(node, asyncio.Event()).set()
+        poller = self._pollers.get(node)
+        if poller is None or poller.done():
+            self._pollers[node] = asyncio.create_task(self._poll(node))
+
+    def _resolve(self, node: str, upid: str, exitstatus: str):
+        for future in self._waiters.get(node, {}).pop(upid, []):
+            if future.done():
+                continue
+            if _succeeded(exitstatus):
+                future.set_result(exitstatus)
+            else:
+                future.set_exception(TaskFailedError(upid, exitstatus))
+
+    async def _fetch_finished(self, node: str, upids: list[str]) -> dict[str, str]:
+        since = min(parse_upid(upid)[1] for upid in upids)
+        tasks = await self._client.get(f"/nodes/{node}/tasks", source="all", since=since, limit=1000)
+        listed = {task["upid"]: task for task in tasks or [] if "upid" in task}
+
+        finished = {}
+        for upid in upids:
+            task = listed.get(upid)
+            if task is not None:
+                if task.get("endtime"):
+                    finished[upid] = task.get("status")
+                continue
+            # Not in the listing (e.g. beyond the limit); ask for this task directly
+            status = await self._client.get(f"/nodes/{node}/tasks/{upid}/status")
+            if status.get("status") == "stopped":
+                finished[upid] = status.get("exitstatus")
+        return finished
+
+    async def _poll(self, node: str):
+        delay = TASK_POLL_MIN
+        wakeup = self._wakeups[node]
+        while self._waiters.get(node):
+            wakeup.clear()
+            upids = list(self._waiters[node])
+            try:
+                finished = await self._fetch_finished(node, upids)
+            except Exception as e:
+                print(f"Task poll on {node} failed: {e}")
+                finished = {}
+
+            for upid, exitstatus in finished.items():
+                self._resolve(node, upid, exitstatus)
+            delay = TASK_POLL_MIN if finished else min(delay * TASK_POLL_BACKOFF, TASK_POLL_MAX)
+
+            if not self._waiters.get(node):
+                break
+            try:
+                await asyncio.wait_for(wakeup.wait(), delay)
+                delay = TASK_POLL_MIN
+            except asyncio.TimeoutError:
+                pass
+        self._pollers.pop(node, None)
+
+
+_watchers: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, TaskWatcher]" = weakref.WeakKeyDictionary()
+
+
+def get_task_watcher() -> TaskWatcher:
+    """Return the watcher for the running event loop"""
+    loop = asyncio.get_running_loop()
+    watcher = _watchers.get(loop)
+    if watcher is None:
+        watcher = TaskWatcher()
+        _watchers[loop] = watcher
+    return watcher
@@ -5,7 +5,7 @@ import { useState, useEffect } from "react";
 import { useRouter } from "next/navigation";
 import Button from "@/components/Button";
 import { useRequireAuth } from "@/hooks/useAuthGuard";
-import { useProxmoxResources, useResourceIP } from "@/hooks/useProxmox";
+import { useDashboard } from "@/hooks/useProxmox";
 import { getCurrentUserInfo } from "@/lib/api/users";
 import { removeAuthToken } from "@/lib/api/auth";
 import { adminDeleteVM, adminDeleteContainer } from "@/lib/api/admin";
@@ -20,11 +20,10 @@ export default function DashboardPage() {
   const { isAuthenticated, isLoading: authLoading } = useRequireAuth();
   const {
     resources,
-    vms,
-    containers,
     loading: resourcesLoading,
     error,
-  } = useProxmoxResources();
+    refetch: refetchDashboard,
+  } = useDashboard();
 
   const [selectedResourceId, setSelectedResourceId] = useState<number | null>(
     null,
@@ -36,17 +35,6 @@ export default function DashboardPage() {
   const [showChangeUsernameModal, setShowChangeUsernameModal] = useState(false);
   const [showChangePasswordModal, setShowChangePasswordModal] = useState(false);
 
-  // Get IP for selected resource
-  const {
-    ip,
-    loading: ipLoading,
-    refetch: refetchIP,
-  } = useResourceIP(
-    selectedResource?.node || "",
-    selectedResource?.vmid || 0,
-    selectedResource?.type || "vm",
-  );
-
   // Set initial selected resource
   useEffect(() => {
     if (resources.length > 0 && !selectedResourceId) {
@@ -381,11 +369,13 @@ export default function DashboardPage() {
                 <div className="flex items-center gap-2">
                   <div>
                     <strong>IP:</strong>{" "}
-                    {ipLoading ? "Loading..." : ip || "N/A"}
+                    {resourcesLoading
+                      ? "Loading..."
+                      : selectedResource.ip || "N/A"}
                   </div>
                   <button
-                    onClick={refetchIP}
-                    disabled={ipLoading}
+                    onClick={refetchDashboard}
+                    disabled={resourcesLoading}
                     className="text-xs bg-gray-100 dark:bg-zinc-700 hover:bg-gray-200 dark:hover:bg-zinc-600 px-2 py-1 rounded disabled:opacity-50"
                     title="Refresh IP"
                   >
@@ -22,6 +22,12 @@ export default function RemoteDesktop({
   const openConnection = async () => {
     if (!resource) return;
 
+    // The dashboard already delivers a ready-to-use console URL
+    if (resource.console_url) {
+      window.open(resource.console_url, "_blank");
+      return;
+    }
+
     setLoading(true);
     setError(null);
 
@@ -15,8 +15,10 @@ import {
   restartContainer,
   deleteContainer,
   getNodePerformance,
+  streamNodePerformance,
   provisionVM,
 } from "@/lib/api/proxmox";
+import { getDashboard } from "@/lib/api/dashboard";
 import {
   VM,
   Container,
@@ -289,6 +291,34 @@ export function useProxmoxResources() {
   };
 }
 
+// Hook for the dashboard: resources with status, IP and console URL in one request
+export function useDashboard() {
+  const [resources, setResources] = useState<ProxmoxResource[]>([]);
+  const [loading, setLoading] = useState(false);
+  const [error, setError] = useState<string | null>(null);
+
+  const fetchDashboard = useCallback(async () => {
+    setLoading(true);
+    setError(null);
+    try {
+      const response = await getDashboard();
+      setResources(response.resources);
+    } catch (err: unknown) {
+      const message =
+        err instanceof Error ? err.message : "Failed to fetch dashboard";
+      setError(message);
+    } finally {
+      setLoading(false);
+    }
+  }, []);
+
+  useEffect(() => {
+    fetchDashboard();
+  }, [fetchDashboard]);
+
+  return { resources, loading, error, refetch: fetchDashboard };
+}
+
 // Hook for getting VM/Container IP addresses
 export function useResourceIP(node: string, vmid: number, type: "vm" | "lxc") {
   const [ip, setIp] = useState<string | null>(null);
@@ -377,42 +407,54 @@ export function useResourceIP(node: string, vmid: number, type: "vm" | "lxc") {
   return { ip, loading, error, refetch: refetchIP };
 }
 
-// Hook for node performance monitoring
-export function useNodePerformance(
-  node: string,
-  refreshInterval: number = 30000,
-) {
+// Hook for node performance monitoring, fed by the server's event stream.
+// retryInterval is the delay before reconnecting after the stream drops.
+export function useNodePerformance(node: string, retryInterval: number = 5000) {
   const [performance, setPerformance] = useState<NodePerformance | null>(null);
   const [loading, setLoading] = useState(false);
   const [error, setError] = useState<string | null>(null);
 
   useEffect(() => {
-    const fetchPerformance = async () => {
-      if (!node) return;
+    if (!node) return;
+
+    const controller = new AbortController();
+    let retryTimeout: ReturnType<typeof setTimeout> | undefined;
 
+    const subscribe = async () => {
       setLoading(true);
       setError(null);
       try {
-        const response = await getNodePerformance(node);
-        setPerformance(response);
+        await streamNodePerformance(
+          node,
+          (update) => {
+            setPerformance(update as unknown as NodePerformance);
+            setLoading(false);
+            setError(null);
+          },
+          controller.signal,
+        );
       } catch (err: unknown) {
+        if (controller.signal.aborted) return;
         if (err instanceof Error) {
           setError(err.message);
         } else {
-          setError("Failed to fetch node performance");
+          setError("Failed to stream node performance");
         }
       } finally {
         setLoading(false);
       }
+      if (!controller.signal.aborted) {
+        retryTimeout = setTimeout(subscribe, retryInterval);
+      }
     };
 
-    fetchPerformance();
+    subscribe();
 
-    if (refreshInterval > 0) {
-      const interval = setInterval(fetchPerformance, refreshInterval);
-      return () => clearInterval(interval);
-    }
-  }, [node, refreshInterval]);
+    return () => {
+      controller.abort();
+      clearTimeout(retryTimeout);
+    };
+  }, [node, retryInterval]);
 
   const refetchPerformance = useCallback(async () => {
     if (!node) return;
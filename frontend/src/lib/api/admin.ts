@@ -107,46 +107,42 @@ export async function getOSTemplates() {
   return authenticatedFetch("/proxmox/os-templates");
 }
 
-export async function provisionVM(provisionData: ProvisionVMRequest) {
-  const token = getAuthToken();
-  if (!token) {
-    throw new Error("No authentication token found");
-  }
-
-  // Use longer timeout for VM provisioning (5 minutes)
-  const controller = new AbortController();
-  const timeoutId = setTimeout(() => controller.abort(), 300000); // 5 minutes
+export async function getProvisionJob(
+  jobId: string,
+): Promise<ProvisionJobResponse> {
+  return authenticatedFetch(`/proxmox/provision/jobs/${jobId}`);
+}
 
-  try {
-    const response = await fetch(`${API_BASE_URL}/proxmox/provision`, {
+export async function provisionVM(
+  provisionData: ProvisionVMRequest,
+  onStage?: (stage: string) => void,
+): Promise<ProvisionVMResponse> {
+  // Provisioning runs as a background job; poll until it finishes (max 15 minutes)
+  const job: ProvisionJobResponse = await authenticatedFetch(
+    "/proxmox/provision",
+    {
       method: "POST",
-      headers: {
-        Authorization: `Bearer ${token}`,
-        "Content-Type": "application/json",
-      },
       body: JSON.stringify(provisionData),
-      signal: controller.signal,
-    });
-
-    clearTimeout(timeoutId);
-
-    if (!response.ok) {
-      const errorData = await response
-        .json()
-        .catch(() => ({ detail: "Unknown error" }));
-      throw new Error(errorData.detail || `HTTP ${response.status}`);
-    }
+    },
+  );
 
-    return response.json();
-  } catch (error: any) {
-    clearTimeout(timeoutId);
-    if (error.name === "AbortError") {
+  const deadline = Date.now() + 900000;
+  let current = job;
+  while (current.status === "queued" || current.status === "running") {
+    if (Date.now() > deadline) {
       throw new Error(
         "VM provisioning timed out. Please check the VM status manually.",
       );
     }
-    throw error;
+    await new Promise((resolve) => setTimeout(resolve, 3000));
+    current = await getProvisionJob(job.job_id);
+    onStage?.(current.stage);
   }
+
+  if (current.status === "failed" || !current.result) {
+    throw new Error(current.error || "Failed to provision VM");
+  }
+  return current.result;
 }
 
 // Admin-only VM/Container deletion with longer timeout
@@ -316,3 +312,15 @@ export interface ProvisionVMResponse {
   ip: string | null;
   node: string;
 }
+
+export interface ProvisionJobResponse {
+  job_id: string;
+  status: "queued" | "running" | "succeeded" | "failed";
+  stage: string;
+  node: string | null;
+  result: ProvisionVMResponse | null;
+  error: string | null;
+  created_at: string;
+  updated_at: string;
+  finished_at: string | null;
+}
@@ -0,0 +1,35 @@
+import { getAuthToken } from "./auth";
+import { DashboardResponse } from "@/types/proxmox";
+
+const API_BASE_URL = "http://127.0.0.1:8000";
+
+// Helper function to make authenticated requests
+async function authenticatedFetch(url: string, options: RequestInit = {}) {
+  const token = getAuthToken();
+  if (!token) {
+    throw new Error("No authentication token found");
+  }
+
+  const response = await fetch(`${API_BASE_URL}${url}`, {
+    ...options,
+    headers: {
+      ...options.headers,
+      Authorization: `Bearer ${token}`,
+      "Content-Type": "application/json",
+    },
+  });
+
+  if (!response.ok) {
+    const errorData = await response
+      .json()
+      .catch(() => ({ detail: "Unknown error" }));
+    throw new Error(errorData.detail || `HTTP ${response.status}`);
+  }
+
+  return response.json();
+}
+
+// VMs and containers with status, IP and console URL in one request
+export async function getDashboard(): Promise<DashboardResponse> {
+  return authenticatedFetch("/dashboard");
+}
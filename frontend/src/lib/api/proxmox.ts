@@ -168,6 +168,93 @@ export async function getNodePerformance(node: string) {
   return authenticatedFetch(`/proxmox/nodes/${node}/performance`);
 }
 
+// Apply a server-side delta: nested objects are merged, null removes a key
+function applyDelta(
+  target: Record<string, unknown>,
+  delta: Record<string, unknown>,
+): Record<string, unknown> {
+  const merged = { ...target };
+  for (const [key, value] of Object.entries(delta)) {
+    if (value === null) {
+      delete merged[key];
+    } else if (
+      typeof value === "object" &&
+      !Array.isArray(value) &&
+      typeof merged[key] === "object" &&
+      merged[key] !== null
+    ) {
+      merged[key] = applyDelta(
+        merged[key] as Record<string, unknown>,
+        value as Record<string, unknown>,
+      );
+    } else {
+      merged[key] = value;
+    }
+  }
+  return merged;
+}
+
+// Subscribe to the node performance event stream. EventSource cannot send the
+// bearer token, so the stream is read through fetch. Resolves when the stream ends.
+export async function streamNodePerformance(
+  node: string,
+  onUpdate: (performance: Record<string, unknown>) => void,
+  signal: AbortSignal,
+) {
+  const token = getAuthToken();
+  if (!token) {
+    throw new Error("No authentication token found");
+  }
+
+  const response = await fetch(
+    `${API_BASE_URL}/proxmox/nodes/${node}/performance/stream`,
+    {
+      headers: {
+        Authorization: `Bearer ${token}`,
+        Accept: "text/event-stream",
+      },
+      signal,
+    },
+  );
+
+  if (!response.ok || !response.body) {
+    const errorData = await response
+      .json()
+      .catch(() => ({ detail: "Unknown error" }));
+    throw new Error(errorData.detail || `HTTP ${response.status}`);
+  }
+
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = "";
+  let current: Record<string, unknown> = {};
+
+  while (true) {
+    const { done, value } = await reader.read();
+    if (done) return;
+    buffer += decoder.decode(value, { stream: true });
+
+    let boundary = buffer.indexOf("\n\n");
+    while (boundary !== -1) {
+      const message = buffer.slice(0, boundary);
+      buffer = buffer.slice(boundary + 2);
+      boundary = buffer.indexOf("\n\n");
+
+      let event = "message";
+      let data = "";
+      for (const line of message.split("\n")) {
+        if (line.startsWith("event: ")) event = line.slice(7);
+        else if (line.startsWith("data: ")) data += line.slice(6);
+      }
+      if (!data) continue; // keep-alive comment
+
+      const payload = JSON.parse(data);
+      current = event === "snapshot" ? payload : applyDelta(current, payload);
+      onUpdate(current);
+    }
+  }
+}
+
 export async function getNodePerformanceFull(node: string) {
   return authenticatedFetch(`/proxmox/nodes/${node}/performance/full`);
 }
@@ -193,7 +280,9 @@ export async function provisionVM(
 
 // Load Balancing
 export async function loadBalanceNodes() {
-  return authenticatedFetch("/proxmox/nodes/load-balance");
+  return authenticatedFetch("/proxmox/nodes/load-balance", {
+    method: "POST",
+  });
 }
 
 // Authentication Management
@@ -206,4 +206,11 @@ export interface ProxmoxResource {
   node: string;
   status: ProxmoxStatus;
   type: "vm" | "lxc";
+  ip?: string | null;
+  console_url?: string | null;
+}
+
+export interface DashboardResponse {
+  username: string;
+  resources: ProxmoxResource[];
 }